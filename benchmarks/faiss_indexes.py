@@ -0,0 +1,143 @@
+"""
+Recall/latency comparison of the FAISS index types built by routers/vector_index.py.
+
+Embeds a local corpus of PDF/TXT files with the application's embedding model
+(or generates clustered synthetic vectors), builds every index type, and reports
+build time, serialized size, query latency and recall@k against exact search.
+
+    python -m benchmarks.faiss_indexes --corpus ~/textbooks --k 4
+    python -m benchmarks.faiss_indexes --synthetic 200000 --dim 384 --output faiss.json
+"""
+from routers import vector_index
+import argparse
+import faiss
+import json
+import numpy as np
+import os
+import time
+
+INDEX_VARIANTS = [
+    ("flat", None, None),
+    ("hnsw", "hnsw", "none"),
+    ("hnsw+fp16", "hnsw", "fp16"),
+    ("hnsw+pq", "hnsw", "pq"),
+    ("ivf", "ivf", "none"),
+    ("ivf+fp16", "ivf", "fp16"),
+    ("ivf+pq", "ivf", "pq"),
+]
+
+def synthetic_vectors(count, dimension, clusters=256, seed=0):
+    """
+    Gaussian clusters, which mimic the structure of sentence embeddings better than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimension)).astype("float32")
+    assignments = rng.integers(0, clusters, size=count)
+    vectors = centres[assignments] + 0.3 * rng.normal(size=(count, dimension)).astype("float32")
+    return vectors.astype("float32")
+
+def corpus_vectors(directory):
+    """
+    Chunk and embed every PDF and text file in a directory the same way ingestion does.
+    """
+    from langchain.document_loaders import PyPDFLoader, TextLoader
+    from routers.text_splitting import splitter_for
+    from routers.utils import embeddings
+
+    documents = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith(".pdf"):
+            documents.extend(PyPDFLoader(path).load())
+        elif name.lower().endswith(".txt"):
+            documents.extend(TextLoader(path, encoding="utf-8").load())
+    embedder = embeddings.get()
+    chunks = splitter_for(embedder).split_documents(documents)
+    vectors = embedder.embed_documents([chunk.page_content for chunk in chunks])
+    return np.asarray(vectors, dtype="float32")
+
+def measure(vectors, queries, k, label, index_type, compression, ground_truth):
+    start_time = time.perf_counter()
+    if label == "flat":
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        description = "flat"
+    else:
+        # Force the approximate index regardless of the flat threshold
+        index, description = vector_index.build_index(vectors, index_type, compression, min_vectors=0)
+    build_seconds = time.perf_counter() - start_time
+
+    latencies = []
+    found = []
+    for query in queries:
+        start_time = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start_time)
+        found.append(ids[0])
+    latencies.sort()
+
+    recall = None
+    if ground_truth is not None:
+        hits = sum(len(set(row) & set(truth)) for row, truth in zip(found, ground_truth))
+        recall = hits / (len(queries) * k)
+
+    return {
+        "index": label,
+        # Differs from the label when the store is too small for the requested compression
+        "built": description,
+        "build_seconds": build_seconds,
+        "size_bytes": int(faiss.serialize_index(index).size),
+        "query_ms_p50": latencies[len(latencies) // 2] * 1000,
+        "query_ms_p95": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        f"recall_at_{k}": recall,
+    }, found
+
+def main(args):
+    if args.corpus:
+        vectors = corpus_vectors(args.corpus)
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+
+    rng = np.random.default_rng(1)
+    query_ids = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    # Perturbed copies of stored vectors stand in for real questions
+    queries = vectors[query_ids] + 0.05 * rng.normal(size=(len(query_ids), vectors.shape[1])).astype("float32")
+
+    results = []
+    ground_truth = None
+    for label, index_type, compression in INDEX_VARIANTS:
+        if args.only and label not in args.only:
+            continue
+        try:
+            result, found = measure(vectors, queries, args.k, label, index_type, compression, ground_truth)
+        except RuntimeError as e:
+            # FAISS raises RuntimeError, e.g. when a small corpus cannot train an index
+            print(f"{label:>10}: failed: {e}")
+            results.append({"index": label, "error": str(e)})
+            continue
+        if label == "flat":
+            ground_truth = found
+            result[f"recall_at_{args.k}"] = 1.0
+        results.append(result)
+        built = f" (built {result['built']})" if result["built"] != label else ""
+        print(f"{label:>10}: build {result['build_seconds']:.2f}s, p50 {result['query_ms_p50']:.3f} ms, "
+              f"recall@{args.k} {result[f'recall_at_{args.k}']}, size {result['size_bytes'] / 1e6:.1f} MB{built}")
+
+    report = {"vectors": int(len(vectors)), "dimension": int(vectors.shape[1]), "queries": int(len(queries)), "k": args.k, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types on a local corpus")
+    parser.add_argument("--corpus", help="Directory of PDF/TXT files to embed")
+    parser.add_argument("--synthetic", type=int, default=100000, help="Number of synthetic vectors when no corpus is given")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--only", nargs="*", help="Restrict to these index types (flat is needed for recall)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,57 @@
+"""
+Local Gradio app exposing the same `/infer` API as the FLUX.1-schnell Space.
+
+Requires the `gradio` package (see benchmarks/requirements.txt). Images are
+plain colour fills, generated after a configurable delay.
+"""
+from PIL import Image
+import argparse
+import random
+import time
+
+def create_demo(latency_ms=2000.0, jitter_ms=500.0, error_rate=0.0):
+    import gradio as gr
+
+    def infer(prompt, seed, randomize_seed, width, height, num_inference_steps):
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0)
+        time.sleep(delay / 1000)
+        if random.random() < error_rate:
+            raise gr.Error("Simulated upstream failure")
+        if randomize_seed:
+            seed = random.randint(0, 2**31 - 1)
+        rng = random.Random(f"{prompt}:{seed}")
+        colour = tuple(rng.randint(0, 255) for _ in range(3))
+        return Image.new("RGB", (int(width), int(height)), colour), seed
+
+    return gr.Interface(
+        fn=infer,
+        inputs=[
+            gr.Textbox(label="prompt"),
+            gr.Number(label="seed", precision=0),
+            gr.Checkbox(label="randomize_seed"),
+            gr.Number(label="width", precision=0),
+            gr.Number(label="height", precision=0),
+            gr.Number(label="num_inference_steps", precision=0),
+        ],
+        outputs=[gr.Image(type="pil", format="png"), gr.Number(label="seed")],
+        api_name="infer",
+        concurrency_limit=None,
+    )
+
+def launch(latency_ms=2000.0, jitter_ms=500.0, error_rate=0.0, host="127.0.0.1", port=7860):
+    """
+    Launch the stand-in without blocking and return its local URL.
+    """
+    demo = create_demo(latency_ms, jitter_ms, error_rate)
+    demo.launch(server_name=host, server_port=port, prevent_thread_lock=True, quiet=True)
+    return f"http://{host}:{port}/"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local Gradio /infer stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--latency-ms", type=float, default=2000.0)
+    parser.add_argument("--jitter-ms", type=float, default=500.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    create_demo(args.latency_ms, args.jitter_ms, args.error_rate).launch(server_name=args.host, server_port=args.port)
@@ -0,0 +1,131 @@
+"""
+Local stand-ins for the IBM upstreams used by the backend.
+
+A single aiohttp application emulates:
+- the IAM token endpoint (POST /identity/token)
+- the watsonx text generation API (POST /ml/v1/text/generation)
+- Watson Text to Speech (POST /v1/synthesize)
+
+Latency, jitter and error rates are configurable so the backend can be
+exercised under realistic and degraded upstream conditions.
+"""
+from aiohttp import web
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+
+QUIZ_RESPONSE = json.dumps([
+    {
+        "question": "ما معنى كلمة 'كتاب'؟",
+        "options": ["book", "pen", "house"],
+        "correct_answer": 0,
+        "explanation": "كلمة 'كتاب' تعني book."
+    }
+], ensure_ascii=False)
+
+TEXT_RESPONSE = "كتاب: شيء نقرأ فيه\n\nقلم: أداة نكتب بها"
+
+# A short silent MP3 frame is enough for the backend, which only base64-encodes the bytes
+MP3_PAYLOAD = bytes.fromhex("fffb9064") + bytes(413)
+
+class UpstreamBehaviour:
+    def __init__(self, latency_ms=200.0, jitter_ms=50.0, error_rate=0.0, throttle_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.counts = {}
+
+    async def apply(self, name):
+        """
+        Sleep for the configured latency and return an error response if one is drawn.
+        """
+        self.counts[name] = self.counts.get(name, 0) + 1
+        delay = max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0)
+        await asyncio.sleep(delay / 1000)
+        draw = random.random()
+        if draw < self.throttle_rate:
+            return web.json_response({"errors": [{"code": "too_many_requests"}]}, status=429, headers={"Retry-After": "1"})
+        if draw < self.throttle_rate + self.error_rate:
+            return web.json_response({"errors": [{"code": "service_unavailable"}]}, status=503)
+        return None
+
+def _b64url(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+def make_access_token(expires_in=3600) -> str:
+    """
+    Build an unsigned JWT, which is all the IBM SDK token manager inspects.
+    """
+    now = int(time.time())
+    header = _b64url({"alg": "HS256", "typ": "JWT"})
+    payload = _b64url({"iat": now, "exp": now + expires_in, "sub": "benchmark"})
+    return f"{header}.{payload}.c2lnbmF0dXJl"
+
+def create_app(behaviour: UpstreamBehaviour) -> web.Application:
+    async def iam_token(request):
+        await request.read()
+        error = await behaviour.apply("iam")
+        if error is not None:
+            return error
+        now = int(time.time())
+        return web.json_response({
+            "access_token": make_access_token(),
+            "refresh_token": "not-a-real-refresh-token",
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "expiration": now + 3600
+        })
+
+    async def text_generation(request):
+        body = await request.json()
+        error = await behaviour.apply("watsonx")
+        if error is not None:
+            return error
+        prompt = body.get("input", "")
+        generated_text = QUIZ_RESPONSE if "JSON array" in prompt else TEXT_RESPONSE
+        return web.json_response({
+            "model_id": body.get("model_id"),
+            "results": [{"generated_text": generated_text, "stop_reason": "eos_token"}]
+        })
+
+    async def synthesize(request):
+        await request.read()
+        error = await behaviour.apply("tts")
+        if error is not None:
+            return error
+        return web.Response(body=MP3_PAYLOAD, content_type="audio/mp3")
+
+    async def stats(request):
+        return web.json_response(behaviour.counts)
+
+    app = web.Application()
+    app.router.add_post("/identity/token", iam_token)
+    app.router.add_post("/ml/v1/text/generation", text_generation)
+    app.router.add_post("/v1/synthesize", synthesize)
+    app.router.add_get("/stats", stats)
+    return app
+
+async def start(behaviour: UpstreamBehaviour, host="127.0.0.1", port=8765) -> web.AppRunner:
+    """
+    Start the mock upstreams in the running event loop and return the runner for cleanup.
+    """
+    runner = web.AppRunner(create_app(behaviour))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the mock IBM upstreams")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    behaviour = UpstreamBehaviour(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)
+    web.run_app(create_app(behaviour), host=args.host, port=args.port)
@@ -0,0 +1,341 @@
+"""
+Offline load test for main:app.
+
+Starts the mock IBM upstreams and the Gradio stand-in, launches the backend
+against them, replays a weighted request mix at a target concurrency and
+reports throughput, latency percentiles, error counts and server RSS as JSON.
+
+    python -m benchmarks.run --concurrency 16 --duration 60 --output bench.json
+    python -m benchmarks.run --baseline bench.json --max-regression 0.15
+
+The Whisper and embedding models are loaded from the local Hugging Face cache;
+set WHISPER_MODEL_ID to a small checkpoint (e.g. openai/whisper-tiny) for quick runs.
+"""
+from . import mock_upstreams
+import aiohttp
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "health=1,language=4,quiz=2,tts=2,image=1,pdf=1,qa=3,audio=1"
+
+STORY = "كان هناك قط صغير يحب القراءة. كل يوم كان يذهب إلى المكتبة. تعلم القط أشياء كثيرة من الكتب."
+
+def _load_payload(relative_path):
+    with open(os.path.join(REPO_ROOT, relative_path), encoding="utf-8") as f:
+        return json.load(f)
+
+def build_scenarios(vector_store_id):
+    """
+    Map each mix name to a factory returning (name, method, path, params, json body).
+    """
+    pdf_payload = _load_payload("pdf/input.json")
+    audio_payload = _load_payload("audio/input.json")
+
+    def language():
+        endpoint = random.choice(["story", "sentence", "cultural-fact", "vocabulary"])
+        params = {"category": "الطعام"} if endpoint == "vocabulary" else None
+        return f"language/{endpoint}", "POST", f"/language/{endpoint}", params, None
+
+    return {
+        "health": lambda: ("health", "GET", "/health", None, None),
+        "language": language,
+        "quiz": lambda: ("quiz", "POST", "/quiz/generate", None, {"quiz_type": "vocabulary", "num_questions": 1}),
+        "tts": lambda: ("tts", "POST", "/tts/convert", None, {"text": STORY}),
+        "image": lambda: ("image", "POST", "/image/generate", None, {"story": STORY, "width": 256, "height": 256}),
+        "lesson": lambda: ("lesson", "POST", "/lesson/generate", None, {"width": 256, "height": 256}),
+        "pdf": lambda: ("pdf", "POST", "/pdf/process", None, pdf_payload),
+        "qa": lambda: ("qa", "POST", "/qa/answer", None, {"question": "ما هو موضوع الرسالة؟", "vector_store_id": vector_store_id or "missing"}),
+        "audio": lambda: ("audio", "POST", "/audio/transcribe/", None, audio_payload),
+    }
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def read_rss_bytes(pid):
+    """
+    Resident memory of a process and its children (e.g. gunicorn workers).
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes if p.is_running())
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+def start_server(args, upstream_url, gradio_url):
+    env = dict(os.environ)
+    env.update({
+        "IBM_IAM_URL": upstream_url,
+        "IBM_WATSONX_URL": upstream_url,
+        "IBM_WATSONX_API_KEY": "benchmark",
+        "IBM_WATSONX_PROJECT_ID": "benchmark",
+        "IBM_WATSON_TTS_URL": upstream_url,
+        "IBM_WATSON_TTS_API_KEY": "benchmark",
+        "GRADIO_API_URL": gradio_url or "http://127.0.0.1:9/",
+        "MODEL_LOADING_MODE": args.loading_mode,
+        "PORT": str(args.port),
+    })
+    if args.server == "gunicorn":
+        env["WEB_CONCURRENCY"] = str(args.workers)
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(args.workers)]
+    return subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+
+async def wait_until_ready(session, base_url, timeout, loading_mode):
+    """
+    Wait until the server has finished loading its resources, successfully or not.
+
+    Failed resources are reported but do not abort the run, so the endpoints that
+    do not depend on them can still be measured. In lazy mode nothing loads before
+    first use, so pending resources count as settled.
+    """
+    unsettled = ("loading",) if loading_mode == "lazy" else ("pending", "loading")
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    resources = (await response.json()).get("resources", {})
+                    if all(info["status"] not in unsettled for info in resources.values()):
+                        for name, info in resources.items():
+                            if info["status"] == "failed":
+                                print(f"Resource {name} failed to load: {info['error']}")
+                        return True
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    return False
+
+async def create_vector_store(session, base_url):
+    payload = _load_payload("pdf/input.json")
+    try:
+        async with session.post(f"{base_url}/pdf/process", json=payload) as response:
+            if response.status == 200:
+                return (await response.json())["vector_store_id"]
+            print(f"Warm-up PDF processing failed with HTTP {response.status}; QA requests will fail")
+    except aiohttp.ClientError as e:
+        print(f"Warm-up PDF processing failed: {e}; QA requests will fail")
+    return None
+
+async def run_load(session, base_url, scenarios, weights, concurrency, duration, max_requests, server_pid):
+    names = [name for name in weights if name in scenarios]
+    name_weights = [weights[name] for name in names]
+    results = []
+    rss_samples = []
+    deadline = time.time() + duration
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while time.time() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            name, method, path, params, body = scenarios[random.choices(names, name_weights)[0]]()
+            start_time = time.perf_counter()
+            try:
+                async with session.request(method, f"{base_url}{path}", params=params, json=body) as response:
+                    await response.read()
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status = 0
+            results.append((name, status, time.perf_counter() - start_time))
+
+    async def sample_rss():
+        while True:
+            rss = read_rss_bytes(server_pid)
+            if rss is not None:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.create_task(sample_rss())
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    sampler.cancel()
+    return results, elapsed, rss_samples
+
+def summarise(results, elapsed):
+    by_name = {}
+    for name, status, latency in results:
+        by_name.setdefault(name, []).append((status, latency))
+    by_name["all"] = [(status, latency) for _, status, latency in results]
+
+    summary = {}
+    for name, entries in sorted(by_name.items()):
+        latencies = sorted(latency for status, latency in entries if 200 <= status < 300)
+        statuses = {}
+        for status, _ in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[name] = {
+            "requests": len(entries),
+            "errors": sum(1 for status, _ in entries if not 200 <= status < 300),
+            "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+            "status_codes": statuses,
+            "latency_ms": {
+                key: (value * 1000 if value is not None else None)
+                for key, value in (
+                    ("p50", percentile(latencies, 0.50)),
+                    ("p90", percentile(latencies, 0.90)),
+                    ("p95", percentile(latencies, 0.95)),
+                    ("p99", percentile(latencies, 0.99)),
+                    ("max", latencies[-1] if latencies else None),
+                )
+            }
+        }
+    return summary
+
+def compare_to_baseline(report, baseline, max_regression):
+    """
+    Return a list of regressions in throughput or p95 latency beyond the allowed fraction.
+    """
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {current['throughput_rps']:.2f} < {previous['throughput_rps']:.2f} rps")
+        old_p95, new_p95 = previous["latency_ms"]["p95"], current["latency_ms"]["p95"]
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + max_regression):
+            regressions.append(f"{name}: p95 {new_p95:.0f} > {old_p95:.0f} ms")
+    return regressions
+
+async def main(args):
+    weights = parse_mix(args.mix)
+    if args.workers > 1 and weights.pop("qa", None):
+        # Vector stores live in the memory of the worker that processed the PDF, so
+        # most QA requests would reach another worker and 404
+        print("Dropping 'qa' from the mix: vector stores are per worker and QA is only measured with --workers 1")
+    behaviour = mock_upstreams.UpstreamBehaviour(args.upstream_latency_ms, args.upstream_jitter_ms, args.upstream_error_rate, args.upstream_throttle_rate)
+    upstream_runner = await mock_upstreams.start(behaviour, port=args.upstream_port)
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+
+    gradio_url = None
+    if weights.get("image") or weights.get("lesson"):
+        try:
+            from . import gradio_standin
+            gradio_url = gradio_standin.launch(args.image_latency_ms, args.image_jitter_ms, args.upstream_error_rate, port=args.gradio_port)
+        except ImportError:
+            print("gradio is not installed; image requests will fail (pip install -r benchmarks/requirements.txt)")
+
+    server = start_server(args, upstream_url, gradio_url)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            boot_start = time.time()
+            if not await wait_until_ready(session, base_url, args.startup_timeout, args.loading_mode):
+                raise SystemExit(f"Server did not become ready within {args.startup_timeout}s")
+            ready_seconds = time.time() - boot_start
+            idle_rss = read_rss_bytes(server.pid)
+
+            vector_store_id = await create_vector_store(session, base_url) if weights.get("qa") else None
+            scenarios = build_scenarios(vector_store_id)
+            results, elapsed, rss_samples = await run_load(
+                session, base_url, scenarios, weights, args.concurrency, args.duration, args.requests, server.pid
+            )
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        await upstream_runner.cleanup()
+
+    report = {
+        "config": {
+            "server": args.server,
+            "workers": args.workers,
+            "loading_mode": args.loading_mode,
+            "concurrency": args.concurrency,
+            "mix": ",".join(f"{name}={weight:g}" for name, weight in weights.items()),
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "upstream_error_rate": args.upstream_error_rate,
+            "upstream_throttle_rate": args.upstream_throttle_rate,
+            "image_latency_ms": args.image_latency_ms,
+        },
+        "elapsed_seconds": elapsed,
+        "startup_to_ready_seconds": ready_seconds,
+        "rss_bytes": {
+            "idle": idle_rss,
+            "peak": max(rss_samples) if rss_samples else None,
+            "end": rss_samples[-1] if rss_samples else None,
+        },
+        "upstream_calls": behaviour.counts,
+        "endpoints": summarise(results, elapsed),
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_to_baseline(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the Arabic Learning API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted request mix, e.g. 'language=4,tts=2'")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--loading-mode", choices=["lazy", "background", "eager", "prefork"], default="eager", help="MODEL_LOADING_MODE for the server")
+    parser.add_argument("--port", type=int, default=8077)
+    parser.add_argument("--upstream-port", type=int, default=8765)
+    parser.add_argument("--gradio-port", type=int, default=7860)
+    parser.add_argument("--upstream-latency-ms", type=float, default=300.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--image-latency-ms", type=float, default=2000.0)
+    parser.add_argument("--image-jitter-ms", type=float, default=500.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON report and exit non-zero on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Allowed relative regression against the baseline")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
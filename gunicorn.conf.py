@@ -0,0 +1,31 @@
+# Pre-fork deployment: gunicorn imports main:app once in the parent process, which
+# loads the fork-safe models (Whisper, the embedding model) before forking workers.
+# The weights are then shared copy-on-write, so each extra worker costs little memory.
+# On GPU hosts CUDA cannot be initialised before forking, so those models are instead
+# loaded onto the GPU by each worker after it forks (one copy per worker).
+#
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# Note: `uvicorn --workers N` spawns fresh interpreters and cannot share models.
+#
+# Image jobs, vector stores and collections are still kept in per-process dicts,
+# so with several workers a job or store created on one worker is unknown (404) to
+# the others. The default is therefore a single worker; raise WEB_CONCURRENCY only
+# behind sticky sessions or for stateless endpoints.
+import os
+
+os.environ.setdefault("MODEL_LOADING_MODE", "prefork")
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+
+def post_fork(server, worker):
+    # Keep workers from oversubscribing the CPU with one intra-op pool each
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(int(os.getenv("TORCH_THREADS_PER_WORKER", 1)))
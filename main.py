@@ -1,8 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routers import transcription, image_gen, language_gen, pdf_processing, question_answering, quiz, text_to_speech
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from routers import transcription, image_gen, language_gen, pdf_processing, question_answering, quiz, text_to_speech, lesson
+from routers import resources, telemetry
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
 
 
 import sys
@@ -12,10 +17,38 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Load environment variables
 load_dotenv()
 
+# Under a pre-forking server (see gunicorn.conf.py) this runs once in the parent,
+# so every worker shares the same model weights
+if resources.MODEL_LOADING_MODE == "prefork":
+    resources.preload_for_fork()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load heavy models and remote clients according to MODEL_LOADING_MODE.
+
+    - lazy: nothing is loaded until an endpoint needs it
+    - background: everything is loaded in parallel while traffic is already accepted
+    - eager: everything is loaded in parallel before the worker starts serving
+    - prefork: fork-safe models come from the parent, the rest load in the background
+
+    Outside lazy mode, failed loads keep being retried in the background with backoff.
+    """
+    telemetry.configure_tracing()
+    loading_task = None
+    if resources.MODEL_LOADING_MODE == "eager":
+        await resources.load_all(retry=False)
+    if resources.MODEL_LOADING_MODE in ("eager", "background", "prefork"):
+        loading_task = asyncio.create_task(resources.load_all())
+    yield
+    if loading_task is not None and not loading_task.done():
+        loading_task.cancel()
+
 app = FastAPI(
     title="Arabic Learning API",
     description="A comprehensive API for Arabic language learning and processing",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -27,6 +60,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Record the latency and status of every request, labelled by route template.
+    """
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        telemetry.observe_request(request.method, route_path, status, time.perf_counter() - start_time)
+
 # Include routers
 app.include_router(transcription.router, prefix="/audio", tags=["Audio Transcription"])
 app.include_router(image_gen.router, prefix="/image", tags=["Image Generation"])
@@ -35,6 +84,7 @@ app.include_router(pdf_processing.router, prefix="/pdf", tags=["PDF Processing"]
 app.include_router(question_answering.router, prefix="/qa", tags=["Question Answering"])
 app.include_router(quiz.router, prefix="/quiz", tags=["Quiz Generation"])
 app.include_router(text_to_speech.router, prefix="/tts", tags=["Text-to-Speech"])
+app.include_router(lesson.router, prefix="/lesson", tags=["Lessons"])
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -48,12 +98,55 @@ async def root():
         "redoc_url": "/redoc"
     }
 
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus-style metrics: request latencies, per-stage durations, payload sizes
+    and upstream status codes.
+    """
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health", tags=["Health Check"])
 async def health_check():
     """
     Health check endpoint to verify if the API is running properly.
+
+    Liveness and readiness are reported separately: the worker is live as soon
+    as it serves requests, and ready once its required models are loaded. Optional
+    remote clients (Gradio, Watson TTS) that failed to load are listed as degraded.
+    """
+    degraded = resources.degraded()
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "ready": resources.is_ready(),
+        "degraded": degraded,
+        "loading_mode": resources.MODEL_LOADING_MODE,
+        "resources": resources.readiness(),
+        "api_version": app.version
+    }
+
+@app.get("/health/live", tags=["Health Check"])
+async def liveness_check():
+    """
+    Liveness probe: succeeds as long as the worker is serving requests.
+    """
+    return {"status": "alive"}
+
+@app.get("/health/ready", tags=["Health Check"])
+async def readiness_check():
+    """
+    Readiness probe: returns 503 until the required models (Whisper, embeddings)
+    are loaded. Unavailable optional clients do not keep the worker out of rotation.
     """
-    return {"status": "healthy", "api_version": app.version}
+    ready = resources.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "loading",
+            "degraded": resources.degraded(),
+            "resources": resources.readiness()
+        }
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,16 +1,45 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
-from gradio_client import Client
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
 import os
 import shutil
+import time
 import uuid
-from typing import Optional
+from typing import Dict, Optional
+from . import image_store
+from .resources import LazyResource
+from . import telemetry
 
 router = APIRouter()
 
-# Initialize the Gradio client
+# Gradio client, connected on first use since it reaches out to the remote Space
 GRADIO_API_URL = os.getenv("GRADIO_API_URL", "black-forest-labs/FLUX.1-schnell")
-gradio_client = Client(GRADIO_API_URL)
+
+def _connect_gradio():
+    from gradio_client import Client
+    return Client(GRADIO_API_URL)
+
+gradio_client = LazyResource("gradio", _connect_gradio, required=False)
+
+# Generation job settings
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("IMAGE_MAX_CONCURRENT_GENERATIONS", 2))
+MAX_QUEUED_JOBS = int(os.getenv("IMAGE_MAX_QUEUED_JOBS", 16))
+JOB_TTL_SECONDS = int(os.getenv("IMAGE_JOB_TTL_SECONDS", 3600))
+
+# Public URL prefix of the image serving route
+IMAGE_URL_PREFIX = os.getenv("IMAGE_URL_PREFIX", "/image/files")
+
+# Bounded executor running the blocking Gradio calls off the event loop
+generation_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GENERATIONS, thread_name_prefix="image-gen")
+
+# In-memory job registry (replace with a proper queue backend in production)
+jobs: Dict[str, dict] = {}
+
+# Jobs currently generating a seeded (deterministic) image, by cache key
+in_flight: Dict[str, str] = {}
 
 class GenerateImageRequest(BaseModel):
     story: str = Field(..., description="The story for which to generate an image")
@@ -21,12 +50,198 @@ class GenerateImageRequest(BaseModel):
 
 class GenerateImageResponse(BaseModel):
     image_path: str = Field(..., description="Path to the generated image")
+    image_url: Optional[str] = Field(None, description="URL from which the generated image can be fetched")
+
+class ImageJobResponse(BaseModel):
+    job_id: str = Field(..., description="Unique identifier of the generation job")
+    status: str = Field(..., description="Status of the job (queued, running, completed, failed)")
+    image_path: Optional[str] = Field(None, description="Path to the generated image once the job has completed")
+    image_url: Optional[str] = Field(None, description="URL from which the generated image can be fetched once the job has completed")
+    error: Optional[str] = Field(None, description="Error message if the job has failed")
+    cached: bool = Field(False, description="Whether the result was served from the seeded generation cache")
+    queue_position: Optional[int] = Field(None, description="Number of jobs ahead of this one while queued")
+
+def _generate_image(request: GenerateImageRequest) -> str:
+    """
+    Run a blocking FLUX generation through Gradio and move the result to the output directory.
+    """
+    image_prompt = f"Create a visual description for this story: {request.story}"
+    client = gradio_client.get()
+    with telemetry.span("gradio_infer", width=request.width, height=request.height):
+        result = client.predict(
+            prompt=image_prompt,
+            seed=request.seed if request.seed is not None else 0,
+            randomize_seed=request.seed is None,
+            width=request.width,
+            height=request.height,
+            num_inference_steps=request.num_inference_steps,
+            api_name="/infer",
+        )
+    image_path = result[0] if isinstance(result, tuple) else result
+
+    # Generate a unique filename
+    unique_filename = f"{uuid.uuid4()}.png"
+    output_dir = image_store.IMAGE_OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, unique_filename)
+
+    # Move the generated image to the output directory
+    shutil.move(image_path, output_path)
+    return output_path
+
+def _image_url(image_path: Optional[str]) -> Optional[str]:
+    if image_path is None:
+        return None
+    return f"{IMAGE_URL_PREFIX}/{os.path.basename(image_path)}"
+
+def _pending_jobs():
+    return [job_id for job_id, job in jobs.items() if job["status"] in ("queued", "running")]
+
+def _prune_jobs():
+    now = time.time()
+    expired = [
+        job_id for job_id, job in jobs.items()
+        if job["finished_at"] is not None and now - job["finished_at"] > JOB_TTL_SECONDS
+    ]
+    for job_id in expired:
+        del jobs[job_id]
+
+def _cache_key(request: GenerateImageRequest) -> Optional[str]:
+    if request.seed is None:
+        return None
+    return image_store.ImageResultCache.make_key(
+        request.story, request.seed, request.width, request.height, request.num_inference_steps
+    )
+
+def _new_job(status: str = "queued", image_path: Optional[str] = None, cached: bool = False) -> str:
+    job_id = str(uuid.uuid4())
+    jobs[job_id] = {
+        "status": status,
+        "image_path": image_path,
+        "error": None,
+        "cached": cached,
+        "created_at": time.time(),
+        "finished_at": time.time() if status == "completed" else None,
+        "done": asyncio.Event(),
+    }
+    if status == "completed":
+        jobs[job_id]["done"].set()
+    return job_id
+
+async def _run_job(job_id: str, request: GenerateImageRequest, cache_key: Optional[str] = None):
+    job = jobs[job_id]
+    loop = asyncio.get_running_loop()
+
+    def run():
+        job["status"] = "running"
+        return _generate_image(request)
+
+    try:
+        job["image_path"] = await loop.run_in_executor(generation_executor, run)
+        job["status"] = "completed"
+    except Exception as e:
+        job["error"] = str(e)
+        job["status"] = "failed"
+    finally:
+        if cache_key is not None and job["status"] != "completed":
+            in_flight.pop(cache_key, None)
+        job["finished_at"] = time.time()
+        job["done"].set()
+    if job["status"] != "completed":
+        return
+
+    # The image exists either way: a failed cache write only costs a future cache hit
+    if cache_key is not None:
+        try:
+            await asyncio.to_thread(image_store.result_cache.put, cache_key, job["image_path"])
+        except Exception as e:
+            print(f"Failed to record image {job['image_path']} in the result cache: {e}")
+        finally:
+            in_flight.pop(cache_key, None)
+    await image_store.evict_in_background()
+
+def submit_job(request: GenerateImageRequest) -> str:
+    """
+    Queue a generation job, rejecting it when the queue is full.
+
+    Seeded requests are deterministic: they are answered from the result cache
+    when possible, and identical requests already being generated share the
+    running job instead of triggering another Gradio call.
+
+    Raises:
+    - HTTPException 503: If the number of pending jobs has reached the configured limit
+    """
+    _prune_jobs()
+    cache_key = _cache_key(request)
+    if cache_key is not None:
+        cached_path = image_store.result_cache.get(cache_key)
+        if cached_path is not None:
+            return _new_job(status="completed", image_path=cached_path, cached=True)
+        if cache_key in in_flight:
+            return in_flight[cache_key]
+
+    if len(_pending_jobs()) >= MAX_CONCURRENT_GENERATIONS + MAX_QUEUED_JOBS:
+        raise HTTPException(
+            status_code=503,
+            detail="Image generation queue is full, please retry later",
+            headers={"Retry-After": "5"}
+        )
+    job_id = _new_job()
+    if cache_key is not None:
+        in_flight[cache_key] = job_id
+    jobs[job_id]["task"] = asyncio.create_task(_run_job(job_id, request, cache_key))
+    return job_id
+
+class ImageGenerationError(Exception):
+    """
+    Raised by `run_job` when the generation job has failed.
+    """
+
+def _job_response(job_id: str) -> ImageJobResponse:
+    job = jobs[job_id]
+    # Executor threads flip jobs from queued to running, so read every status once
+    statuses = {pending: pending_job["status"] for pending, pending_job in list(jobs.items())}
+    status = statuses[job_id]
+    queue_position = None
+    if status == "queued":
+        queued = [pending for pending, pending_status in statuses.items() if pending_status == "queued"]
+        queue_position = queued.index(job_id)
+    return ImageJobResponse(
+        job_id=job_id,
+        status=status,
+        image_path=job["image_path"],
+        image_url=_image_url(job["image_path"]),
+        error=job["error"],
+        cached=job["cached"],
+        queue_position=queue_position
+    )
+
+async def run_job(request: GenerateImageRequest) -> ImageJobResponse:
+    """
+    Queue a generation job and wait for it to finish.
+
+    Returns:
+    - The completed job, with the image path and URL
+
+    Raises:
+    - HTTPException 503: If the generation queue is full
+    - ImageGenerationError: If the generation has failed
+    """
+    job_id = submit_job(request)
+    job = jobs[job_id]
+    await job["done"].wait()
+    if job["status"] == "failed":
+        raise ImageGenerationError(job["error"])
+    return _job_response(job_id)
 
 @router.post("/generate", response_model=GenerateImageResponse)
 async def generate_image_endpoint(request: GenerateImageRequest):
     """
     Generate an image based on a given story using the FLUX.1-schnell model.
 
+    The generation goes through the same bounded job queue as `/jobs`, so the
+    event loop stays free while the upstream model is working.
+
     Parameters:
     - story: The story to base the image on
     - seed: Optional seed for random number generation
@@ -38,33 +253,178 @@ async def generate_image_endpoint(request: GenerateImageRequest):
     - A JSON object containing the path to the generated image
 
     Raises:
+    - HTTPException 503: If the generation queue is full
     - HTTPException 500: If there's an error in generating the image
     """
     try:
-        image_prompt = f"Create a visual description for this story: {request.story}"
-        result = gradio_client.predict(
-            prompt=image_prompt,
-            seed=request.seed if request.seed is not None else 0,
-            randomize_seed=request.seed is None,
-            width=request.width,
-            height=request.height,
-            num_inference_steps=request.num_inference_steps,
-            api_name="/infer",
-        )
-        image_path = result[0] if isinstance(result, tuple) else result
-        
-        # Generate a unique filename
-        unique_filename = f"{uuid.uuid4()}.png"
-        output_dir = os.getenv("IMAGE_OUTPUT_DIR", "images")
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, unique_filename)
-        
-        # Move the generated image to the output directory
-        shutil.move(image_path, output_path)
-        
-        return GenerateImageResponse(image_path=output_path)
-    except Exception as e:
+        result = await run_job(request)
+    except ImageGenerationError as e:
         raise HTTPException(status_code=500, detail=f"Error in generating image: {str(e)}")
+    return GenerateImageResponse(image_path=result.image_path, image_url=result.image_url)
+
+@router.post("/jobs", response_model=ImageJobResponse, status_code=202)
+async def submit_image_job(request: GenerateImageRequest):
+    """
+    Submit an image generation job and return immediately.
+
+    Parameters:
+    - Same as `/generate`
+
+    Returns:
+    - A JSON object containing the job identifier and its initial status
+
+    Raises:
+    - HTTPException 503: If the generation queue is full
+    """
+    job_id = submit_job(request)
+    return _job_response(job_id)
+
+@router.get("/jobs/{job_id}", response_model=ImageJobResponse)
+async def get_image_job(job_id: str):
+    """
+    Retrieve the status of an image generation job.
+
+    Parameters:
+    - job_id: The identifier returned by `/jobs`
+
+    Returns:
+    - A JSON object containing the job status and, once completed, the image path
+
+    Raises:
+    - HTTPException 404: If the job is not found
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job_id)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_image_job_events(job_id: str, keepalive: float = Query(15.0, gt=0, description="Seconds between keep-alive comments")):
+    """
+    Stream the completion of an image generation job as Server-Sent Events.
+
+    A single `completed` or `failed` event is sent once the job finishes,
+    with keep-alive comments in between.
+
+    Parameters:
+    - job_id: The identifier returned by `/jobs`
+
+    Raises:
+    - HTTPException 404: If the job is not found
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = jobs[job_id]
+
+    async def events():
+        while not job["done"].is_set():
+            try:
+                await asyncio.wait_for(job["done"].wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+        payload = _job_response(job_id).dict()
+        yield f"event: {job['status']}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/files/{image_name}")
+async def get_image_file(
+    image_name: str,
+    request: Request,
+    variant: str = Query("original", description="Size variant to serve (original, medium, thumbnail)"),
+    format: Optional[str] = Query(None, description="Output format (png, webp, avif); negotiated from the Accept header when omitted")
+):
+    """
+    Serve a generated image, optionally resized and transcoded.
+
+    Variants are generated lazily and cached next to the output directory.
+    Responses carry an ETag and honour `If-None-Match` and single `Range` requests.
+
+    Parameters:
+    - image_name: File name of the generated image (as returned in `image_path`)
+    - variant: Size variant to serve (default: original)
+    - format: Output format (default: negotiated)
+
+    Returns:
+    - The image bytes
+
+    Raises:
+    - HTTPException 400: If the variant or format is not supported
+    - HTTPException 404: If the image is not found
+    - HTTPException 416: If the requested range cannot be satisfied
+    """
+    if variant not in image_store.VARIANT_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unsupported variant: {variant}")
+    fmt = format or image_store.negotiate_format(request.headers.get("accept"))
+    if fmt not in image_store.FORMAT_MEDIA_TYPES or (fmt == "avif" and not image_store.avif_supported()):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+
+    original_path = image_store.resolve_original(image_name)
+    if original_path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    try:
+        path = await asyncio.to_thread(image_store.get_variant, original_path, variant, fmt)
+        etag = image_store.file_etag(path)
+        file_size = os.path.getsize(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in preparing image: {str(e)}")
+
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    media_type = image_store.FORMAT_MEDIA_TYPES[fmt]
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) != etag:
+        range_header = None
+    try:
+        byte_range = image_store.parse_range(range_header, file_size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{file_size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(file_size)
+        return StreamingResponse(image_store.read_range(path, 0, file_size - 1), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(image_store.read_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+@router.get("/storage", response_model=dict)
+async def get_storage_info():
+    """
+    Retrieve disk usage of generated images and their cached variants.
+
+    Returns:
+    - A JSON object containing the bytes used by originals and variants, and the configured limit
+    """
+    return await asyncio.to_thread(image_store.disk_usage)
+
+@router.get("/queue", response_model=dict)
+async def get_queue_info():
+    """
+    Retrieve information about the image generation queue.
+
+    Returns:
+    - A JSON object containing the concurrency limits and current queue usage
+    """
+    pending = _pending_jobs()
+    return {
+        "cache": image_store.result_cache.stats(),
+        "coalesced_in_flight": len(in_flight),
+        "max_concurrent_generations": MAX_CONCURRENT_GENERATIONS,
+        "max_queued_jobs": MAX_QUEUED_JOBS,
+        "running": sum(1 for job_id in pending if jobs[job_id]["status"] == "running"),
+        "queued": sum(1 for job_id in pending if jobs[job_id]["status"] == "queued"),
+    }
 
 @router.get("/model-info", response_model=dict)
 async def get_model_info():
@@ -72,6 +432,6 @@ async def get_model_info():
     Retrieve information about the currently used image generation model.
 
     Returns:
-    - A JSON object containing the Gradio API URL being used
+    - A JSON object containing the Gradio API URL being used and the client connection status
     """
-    return {"gradio_api_url": GRADIO_API_URL}
\ No newline at end of file
+    return {"gradio_api_url": GRADIO_API_URL, "status": gradio_client.status}
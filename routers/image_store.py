@@ -0,0 +1,326 @@
+from PIL import Image
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are only serialized within a process
+    fcntl = None
+
+# Storage locations for generated images and their resized/transcoded variants
+IMAGE_OUTPUT_DIR = os.getenv("IMAGE_OUTPUT_DIR", "images")
+IMAGE_VARIANT_DIR = os.getenv("IMAGE_VARIANT_DIR", f"{IMAGE_OUTPUT_DIR.rstrip(os.sep)}_variants")
+
+# On-disk index of deterministic (seeded) generation results
+IMAGE_CACHE_INDEX = os.getenv("IMAGE_CACHE_INDEX", f"{IMAGE_OUTPUT_DIR.rstrip(os.sep)}_cache.json")
+
+# Disk budget for both directories combined (0 disables eviction)
+IMAGE_DIR_MAX_BYTES = int(os.getenv("IMAGE_DIR_MAX_BYTES", 0))
+IMAGE_DIR_LOW_WATERMARK = float(os.getenv("IMAGE_DIR_LOW_WATERMARK", 0.9))
+
+# Longest side, in pixels, of each resized variant
+VARIANT_SIZES: Dict[str, Optional[int]] = {
+    "original": None,
+    "medium": int(os.getenv("IMAGE_MEDIUM_SIZE", 512)),
+    "thumbnail": int(os.getenv("IMAGE_THUMBNAIL_SIZE", 160)),
+}
+
+FORMAT_MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", 80))
+AVIF_QUALITY = int(os.getenv("IMAGE_AVIF_QUALITY", 60))
+
+_variant_locks: Dict[str, threading.Lock] = {}
+_variant_locks_guard = threading.Lock()
+_eviction_lock = threading.Lock()
+
+def avif_supported() -> bool:
+    """
+    Check whether the installed Pillow build can encode AVIF.
+    """
+    return "AVIF" in Image.SAVE
+
+def resolve_original(image_name: str) -> Optional[str]:
+    """
+    Map a public image name to its file in the output directory, or None if it does not exist.
+    """
+    if os.path.basename(image_name) != image_name or not image_name.endswith(".png"):
+        return None
+    path = os.path.join(IMAGE_OUTPUT_DIR, image_name)
+    return path if os.path.isfile(path) else None
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Pick the smallest output format the client accepts.
+    """
+    accept = accept or ""
+    if "image/avif" in accept and avif_supported():
+        return "avif"
+    if "image/webp" in accept:
+        return "webp"
+    return "png"
+
+def _variant_lock(key: str) -> threading.Lock:
+    with _variant_locks_guard:
+        return _variant_locks.setdefault(key, threading.Lock())
+
+def _build_variant(original_path: str, variant_path: str, size: Optional[int], fmt: str):
+    with Image.open(original_path) as image:
+        if size is not None:
+            image.thumbnail((size, size), Image.LANCZOS)
+        if fmt == "webp":
+            image.save(variant_path, "WEBP", quality=WEBP_QUALITY, method=4)
+        elif fmt == "avif":
+            image.save(variant_path, "AVIF", quality=AVIF_QUALITY)
+        else:
+            image.save(variant_path, "PNG", optimize=True)
+
+def get_variant(original_path: str, variant: str, fmt: str) -> str:
+    """
+    Return the path of a resized/transcoded variant, generating and caching it on first use.
+
+    The original file is returned unchanged for the `original` variant in PNG.
+    """
+    if variant == "original" and fmt == "png":
+        return original_path
+
+    stem = os.path.splitext(os.path.basename(original_path))[0]
+    variant_path = os.path.join(IMAGE_VARIANT_DIR, f"{stem}.{variant}.{fmt}")
+    if os.path.isfile(variant_path):
+        return variant_path
+
+    with _variant_lock(variant_path):
+        if not os.path.isfile(variant_path):
+            os.makedirs(IMAGE_VARIANT_DIR, exist_ok=True)
+            tmp_path = f"{variant_path}.{threading.get_ident()}.tmp"
+            try:
+                _build_variant(original_path, tmp_path, VARIANT_SIZES[variant], fmt)
+                os.replace(tmp_path, variant_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+    with _variant_locks_guard:
+        _variant_locks.pop(variant_path, None)
+    return variant_path
+
+def file_etag(path: str) -> str:
+    """
+    Build a strong ETag from the file's size and modification time.
+    """
+    stat = os.stat(path)
+    digest = hashlib.md5(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return f'"{digest}"'
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=start-end` range into inclusive offsets.
+
+    Returns None when the header is absent or uses multiple ranges, and raises
+    ValueError when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    if start_text == "":
+        if not end_text:
+            raise ValueError("Invalid range")
+        length = int(end_text)
+        if length == 0:
+            raise ValueError("Invalid range")
+        start, end = max(file_size - length, 0), file_size - 1
+    else:
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+        end = min(end, file_size - 1)
+    if start > end or start >= file_size:
+        raise ValueError("Invalid range")
+    return start, end
+
+def read_range(path: str, start: int, end: int, chunk_size: int = 64 * 1024):
+    """
+    Yield the bytes between the inclusive offsets in chunks.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _collect_files(directory: str):
+    files = []
+    if not os.path.isdir(directory):
+        return files
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((entry.path, stat.st_size, max(stat.st_atime, stat.st_mtime)))
+    return files
+
+def disk_usage() -> Dict[str, int]:
+    """
+    Report the number of bytes used by originals and variants.
+    """
+    originals = sum(size for _, size, _ in _collect_files(IMAGE_OUTPUT_DIR))
+    variants = sum(size for _, size, _ in _collect_files(IMAGE_VARIANT_DIR))
+    return {"originals_bytes": originals, "variants_bytes": variants, "max_bytes": IMAGE_DIR_MAX_BYTES}
+
+def evict_if_needed() -> int:
+    """
+    Delete least recently used files until usage drops below the low watermark.
+
+    Variants are evicted before originals since they can be rebuilt on demand.
+    Returns the number of bytes freed.
+    """
+    if IMAGE_DIR_MAX_BYTES <= 0:
+        return 0
+    with _eviction_lock:
+        variants = _collect_files(IMAGE_VARIANT_DIR)
+        originals = _collect_files(IMAGE_OUTPUT_DIR)
+        total = sum(size for _, size, _ in variants) + sum(size for _, size, _ in originals)
+        if total <= IMAGE_DIR_MAX_BYTES:
+            return 0
+
+        target = IMAGE_DIR_MAX_BYTES * IMAGE_DIR_LOW_WATERMARK
+        candidates = [(path, size, False) for path, size, _ in sorted(variants, key=lambda f: f[2])]
+        candidates += [(path, size, True) for path, size, _ in sorted(originals, key=lambda f: f[2])]
+        freed = 0
+        for path, size, is_original in candidates:
+            if total - freed <= target:
+                break
+            try:
+                os.unlink(path)
+                freed += size
+            except FileNotFoundError:
+                continue
+            if is_original:
+                stem = os.path.splitext(os.path.basename(path))[0]
+                for variant_path, variant_size, _ in _collect_files(IMAGE_VARIANT_DIR):
+                    if os.path.basename(variant_path).startswith(f"{stem}."):
+                        try:
+                            os.unlink(variant_path)
+                            freed += variant_size
+                        except FileNotFoundError:
+                            pass
+        return freed
+
+async def evict_in_background():
+    """
+    Run the eviction policy without blocking the event loop.
+    """
+    await asyncio.to_thread(evict_if_needed)
+
+class ImageResultCache:
+    """
+    Map deterministic generation parameters to stored image files.
+
+    Entries are persisted to a JSON index so cached results survive restarts.
+    Entries whose image has been evicted are dropped on lookup.
+    """
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.entries: Dict[str, str] = {}
+        self.index_mtime: Optional[float] = None
+        self.lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def make_key(story: str, seed: int, width: int, height: int, num_inference_steps: int) -> str:
+        payload = json.dumps([story, seed, width, height, num_inference_steps], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _read_index(self) -> Dict[str, str]:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            print(f"Ignoring unreadable image cache index {self.index_path}: {e}")
+            return {}
+
+    def _index_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.index_path)
+        except OSError:
+            return None
+
+    def _load(self):
+        self.index_mtime = self._index_mtime()
+        self.entries = self._read_index()
+
+    @contextmanager
+    def _index_lock(self):
+        """
+        Serialize index updates across worker processes sharing the same file.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.index_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self, key: str, image_path: str):
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._index_lock():
+            # Merge with entries written by other workers, dropping evicted images
+            entries = self._read_index()
+            entries.update(self.entries)
+            entries[key] = image_path
+            entries = {entry_key: path for entry_key, path in entries.items() if os.path.isfile(path)}
+            tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.index_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            self.entries = entries
+            self.index_mtime = self._index_mtime()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached image without writing to disk, so it is safe to call from the event loop.
+        """
+        with self.lock:
+            if key not in self.entries and self._index_mtime() != self.index_mtime:
+                # Another worker has updated the index since it was last read
+                self._load()
+            image_path = self.entries.get(key)
+            if image_path is None:
+                return None
+            if not os.path.isfile(image_path):
+                # Dropped from the index file on the next save
+                del self.entries[key]
+                return None
+            return image_path
+
+    def put(self, key: str, image_path: str):
+        with self.lock:
+            self.entries[key] = image_path
+            self._save(key, image_path)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries)}
+
+result_cache = ImageResultCache(IMAGE_CACHE_INDEX)
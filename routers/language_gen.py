@@ -45,7 +45,7 @@ async def generate_vocabulary_endpoint(category: str = Query(..., description="C
             input_variables=["category"],
             template="Create 5 Arabic words related to {category} with a simple explanation for each word in Arabic."
         ).format(category=category)
-        response = watson_wrapper.generate_text(prompt)
+        response = await watson_wrapper.generate_text(prompt)
         
         # Parse the response and convert it to the required format
         words = [{'word': word.strip(), 'explanation': explanation.strip()} 
@@ -68,7 +68,7 @@ async def generate_sentence_endpoint():
     """
     try:
         prompt = "Create a simple Arabic sentence suitable for beginners with an explanation of its meaning."
-        response = watson_wrapper.generate_text(prompt)
+        response = await watson_wrapper.generate_text(prompt)
         
         # Parse the response
         sentence, explanation = response.split('\n', 1)
@@ -89,7 +89,7 @@ async def generate_story_endpoint():
     """
     try:
         prompt = "Tell a very short story (3-4 sentences) in Arabic for children, then explain its meaning simply."
-        response = watson_wrapper.generate_text(prompt)
+        response = await watson_wrapper.generate_text(prompt)
         
         # Parse the response
         story, explanation = response.split('\n\n', 1)
@@ -110,7 +110,7 @@ async def generate_cultural_fact_endpoint():
     """
     try:
         prompt = "Share an interesting fact about Arabic culture or an Arabic-speaking country."
-        response = watson_wrapper.generate_text(prompt)
+        response = await watson_wrapper.generate_text(prompt)
         return CulturalFactResponse(fact=response.strip())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in generating cultural fact: {str(e)}")
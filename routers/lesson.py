@@ -0,0 +1,115 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+import asyncio
+import json
+import time
+from .utils import ArabicLearningUtility
+from . import image_gen
+from . import telemetry
+
+router = APIRouter()
+
+arabic_learning_utility = ArabicLearningUtility()
+
+class LessonRequest(BaseModel):
+    include_image: bool = Field(True, description="Whether to illustrate the story")
+    include_audio: bool = Field(True, description="Whether to narrate the story")
+    seed: Optional[int] = Field(None, description="Seed for the image generation (optional)")
+    width: int = Field(1024, description="Width of the generated image")
+    height: int = Field(1024, description="Height of the generated image")
+    num_inference_steps: int = Field(4, description="Number of inference steps for the image")
+
+def _parse_story(response: str):
+    """
+    Split the generated text into the story and its explanation, like `/language/story`.
+    """
+    story, _, explanation = response.strip().partition("\n\n")
+    return story.strip(), explanation.strip()
+
+def _event(name: str, payload: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def _illustrate(request: LessonRequest, story: str) -> dict:
+    image_request = image_gen.GenerateImageRequest(
+        story=story,
+        seed=request.seed,
+        width=request.width,
+        height=request.height,
+        num_inference_steps=request.num_inference_steps
+    )
+    try:
+        result = await image_gen.run_job(image_request)
+    except HTTPException as e:
+        # A full generation queue only costs the lesson its illustration
+        raise Exception(e.detail)
+    return {"image_path": result.image_path, "image_url": result.image_url, "cached": result.cached}
+
+async def _narrate(story: str) -> dict:
+    return {"audio_content": await arabic_learning_utility.text_to_speech(story)}
+
+@router.post("/generate")
+async def generate_lesson(request: LessonRequest, keepalive: float = Query(15.0, gt=0, description="Seconds between keep-alive comments")):
+    """
+    Generate a short lesson (story, illustration and narration) as Server-Sent Events.
+
+    The story is generated first, then the image and the narration are produced
+    concurrently, so the lesson takes roughly the story time plus the slower of
+    the two instead of their sum. Each artifact is streamed as soon as it is
+    ready: a `story` event, then `image` and `audio` events in completion order.
+    An artifact that fails is reported in an `error` event without affecting
+    the others, and a final `done` event lists what was produced.
+
+    Parameters:
+    - include_image: Whether to illustrate the story (default: true)
+    - include_audio: Whether to narrate the story (default: true)
+    - seed, width, height, num_inference_steps: Image generation settings, as for `/image/generate`
+
+    Returns:
+    - A `text/event-stream` response whose events carry JSON payloads with an `elapsed` time in seconds
+    """
+    async def events():
+        start_time = time.perf_counter()
+        completed, failed = [], []
+
+        def elapsed():
+            return round(time.perf_counter() - start_time, 3)
+
+        try:
+            with telemetry.span("lesson_story"):
+                story, explanation = _parse_story(await arabic_learning_utility.generate_text("story"))
+        except Exception as e:
+            yield _event("error", {"artifact": "story", "error": str(e), "elapsed": elapsed()})
+            yield _event("done", {"completed": completed, "failed": ["story"], "elapsed": elapsed()})
+            return
+        completed.append("story")
+        yield _event("story", {"story": story, "explanation": explanation, "elapsed": elapsed()})
+
+        tasks = {}
+        if request.include_image:
+            tasks[asyncio.ensure_future(_illustrate(request, story))] = "image"
+        if request.include_audio:
+            tasks[asyncio.ensure_future(_narrate(story))] = "audio"
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    yield ": keep-alive\n\n"
+                for task in done:
+                    artifact = tasks[task]
+                    if task.exception() is None:
+                        completed.append(artifact)
+                        yield _event(artifact, {**task.result(), "elapsed": elapsed()})
+                    else:
+                        failed.append(artifact)
+                        yield _event("error", {"artifact": artifact, "error": str(task.exception()), "elapsed": elapsed()})
+        finally:
+            # The client went away: stop waiting (queued image jobs still finish and get cached)
+            for task in pending:
+                task.cancel()
+        yield _event("done", {"completed": completed, "failed": failed, "elapsed": elapsed()})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -2,9 +2,10 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from routers.utils import ArabicLearningUtility
+from routers import telemetry
 import uuid
 import base64
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 router = APIRouter()
 
@@ -14,9 +15,13 @@ arabic_learning_utility = ArabicLearningUtility()
 # In-memory storage for vector stores (replace with a proper database in production)
 vector_stores: Dict[str, object] = {}
 
+# Named collections grouping the vector stores of a course
+collections: Dict[str, List[str]] = {}
+
 class PDFRequest(BaseModel):
     file_content: str = Field(..., description="Base64 encoded PDF content")
     file_name: Optional[str] = Field(None, description="Original filename of the PDF")
+    collection: Optional[str] = Field(None, description="Name of the collection to add the processed PDF to")
 
 class PDFResponse(BaseModel):
     vector_store_id: str = Field(..., description="Unique identifier for the processed vector store")
@@ -25,6 +30,13 @@ class VectorStoreInfo(BaseModel):
     id: str = Field(..., description="Unique identifier of the vector store")
     file_name: Optional[str] = Field(None, description="Original filename of the processed PDF")
     status: str = Field(..., description="Status of the vector store")
+    index_type: Optional[str] = Field(None, description="FAISS index class backing the vector store")
+    vector_count: Optional[int] = Field(None, description="Number of indexed chunks")
+    collection: Optional[str] = Field(None, description="Collection the vector store belongs to")
+
+class CollectionInfo(BaseModel):
+    name: str = Field(..., description="Name of the collection")
+    vector_store_ids: List[str] = Field(..., description="Identifiers of the vector stores in the collection")
 
 @router.post("/process", response_model=PDFResponse, summary="Process a PDF file")
 async def process_pdf(pdf_request: PDFRequest):
@@ -34,6 +46,7 @@ async def process_pdf(pdf_request: PDFRequest):
     Parameters:
     - file_content: Base64 encoded content of the PDF file to be processed
     - file_name: Optional original filename of the PDF
+    - collection: Optional name of a collection to add the vector store to
 
     Returns:
     - A JSON object containing a unique identifier for the created vector store
@@ -43,14 +56,21 @@ async def process_pdf(pdf_request: PDFRequest):
     - HTTPException 500: If there's an internal server error during processing
     """
     try:
-        file_content = base64.b64decode(pdf_request.file_content)
+        telemetry.record_payload("base64_decode", len(pdf_request.file_content))
+        with telemetry.span("base64_decode"):
+            file_content = base64.b64decode(pdf_request.file_content)
         vector_store = await arabic_learning_utility.process_pdf(file_content)
         vector_store_id = str(uuid.uuid4())
         vector_stores[vector_store_id] = {
             "store": vector_store,
             "file_name": pdf_request.file_name,
-            "status": "available"
+            "status": "available",
+            "index_type": type(vector_store.index).__name__,
+            "vector_count": vector_store.index.ntotal,
+            "collection": pdf_request.collection
         }
+        if pdf_request.collection:
+            collections.setdefault(pdf_request.collection, []).append(vector_store_id)
         return PDFResponse(vector_store_id=vector_store_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing PDF: {str(e)}")
@@ -75,7 +95,10 @@ async def get_vector_store(vector_store_id: str):
     return VectorStoreInfo(
         id=vector_store_id,
         file_name=vector_store["file_name"],
-        status=vector_store["status"]
+        status=vector_store["status"],
+        index_type=vector_store["index_type"],
+        vector_count=vector_store["vector_count"],
+        collection=vector_store["collection"]
     )
 
 @router.delete("/vector_store/{vector_store_id}", summary="Delete a vector store")
@@ -94,7 +117,11 @@ async def delete_vector_store(vector_store_id: str):
     """
     if vector_store_id not in vector_stores:
         raise HTTPException(status_code=404, detail="Vector store not found")
-    del vector_stores[vector_store_id]
+    collection = vector_stores.pop(vector_store_id)["collection"]
+    if collection in collections:
+        collections[collection].remove(vector_store_id)
+        if not collections[collection]:
+            del collections[collection]
     return JSONResponse(content={"message": f"Vector store {vector_store_id} has been deleted"})
 
 @router.get("/vector_stores", response_model=Dict[str, VectorStoreInfo], summary="List all vector stores")
@@ -106,10 +133,48 @@ async def list_vector_stores():
     - A JSON object containing information about all vector stores
     """
     return {
-        id: VectorStoreInfo(id=id, file_name=info["file_name"], status=info["status"])
+        id: VectorStoreInfo(
+            id=id,
+            file_name=info["file_name"],
+            status=info["status"],
+            index_type=info["index_type"],
+            vector_count=info["vector_count"],
+            collection=info["collection"]
+        )
         for id, info in vector_stores.items()
     }
 
+@router.get("/collections", response_model=Dict[str, CollectionInfo], summary="List all collections")
+async def list_collections():
+    """
+    List all named collections of vector stores.
+
+    Returns:
+    - A JSON object containing every collection and the identifiers of its vector stores
+    """
+    return {
+        name: CollectionInfo(name=name, vector_store_ids=ids)
+        for name, ids in collections.items()
+    }
+
+@router.get("/collections/{name}", response_model=CollectionInfo, summary="Retrieve a collection")
+async def get_collection(name: str):
+    """
+    Retrieve the vector stores of a named collection.
+
+    Parameters:
+    - name: The name of the collection
+
+    Returns:
+    - A JSON object containing the identifiers of the vector stores in the collection
+
+    Raises:
+    - HTTPException 404: If the collection is not found
+    """
+    if name not in collections:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return CollectionInfo(name=name, vector_store_ids=collections[name])
+
 @router.get("/health", summary="Check the health of the PDF processing service")
 async def health_check():
     """
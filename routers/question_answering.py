@@ -1,56 +1,149 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from routers.utils import ArabicLearningUtility
-from typing import Dict, Optional
+from routers.pdf_processing import vector_stores, collections
+from typing import Dict, List, Optional
 
 router = APIRouter()
 
 # Initialize the ArabicLearningUtility
 arabic_learning_utility = ArabicLearningUtility()
 
-# Assume this is connected to an external storage system or the one from PDF processing
-vector_stores: Dict[str, object] = {}
-
 class QuestionRequest(BaseModel):
     question: str = Field(..., description="Question to be answered based on the processed content")
-    vector_store_id: str = Field(..., description="Identifier of the vector store to use for answering the question")
+    vector_store_id: Optional[str] = Field(None, description="Identifier of the vector store to use for answering the question")
+    vector_store_ids: Optional[List[str]] = Field(None, description="Identifiers of several vector stores to search together")
+    collection: Optional[str] = Field(None, description="Name of a collection whose vector stores should all be searched")
     language: Optional[str] = Field("ar", description="Language of the question and expected answer (default: Arabic)")
+    top_k: int = Field(3, description="Number of passages, across all stores, given to the model as context", ge=1, le=20)
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., description="Text to search for")
+    vector_store_id: Optional[str] = Field(None, description="Identifier of the vector store to search")
+    vector_store_ids: Optional[List[str]] = Field(None, description="Identifiers of several vector stores to search together")
+    collection: Optional[str] = Field(None, description="Name of a collection whose vector stores should all be searched")
+    top_k: int = Field(4, description="Number of results to return across all stores", ge=1, le=50)
+
+class SourcePassage(BaseModel):
+    vector_store_id: str = Field(..., description="Vector store the passage comes from")
+    content: str = Field(..., description="Text of the passage")
+    page: Optional[int] = Field(None, description="Page of the PDF the passage comes from")
+    distance: float = Field(..., description="L2 distance to the query (smaller is closer)")
 
 class QuestionResponse(BaseModel):
     answer: str = Field(..., description="Answer to the provided question")
     confidence: float = Field(..., description="Confidence score of the answer", ge=0, le=1)
+    sources: List[SourcePassage] = Field([], description="Passages used as context, closest first")
+
+class SearchResponse(BaseModel):
+    results: List[SourcePassage] = Field(..., description="Closest passages across all searched stores")
+
+def resolve_vector_stores(vector_store_id: Optional[str], vector_store_ids: Optional[List[str]], collection: Optional[str]):
+    """
+    Collect the stores named by a request, in order and without duplicates.
+
+    Raises:
+    - HTTPException 400: If no vector store or collection is given
+    - HTTPException 404: If the collection or any vector store is not found
+    """
+    ids = []
+    if vector_store_id:
+        ids.append(vector_store_id)
+    ids.extend(vector_store_ids or [])
+    if collection is not None:
+        if collection not in collections:
+            raise HTTPException(status_code=404, detail="Collection not found")
+        ids.extend(collections[collection])
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="Provide vector_store_id, vector_store_ids or collection")
+    missing = [store_id for store_id in ids if store_id not in vector_stores]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Vector store not found: {', '.join(missing)}")
+    return {store_id: vector_stores[store_id]["store"] for store_id in ids}
+
+def to_passages(hits) -> List[SourcePassage]:
+    return [
+        SourcePassage(
+            vector_store_id=store_id,
+            content=doc.page_content,
+            page=doc.metadata.get("page"),
+            distance=distance
+        )
+        for store_id, doc, distance in hits
+    ]
 
 @router.post("/answer", response_model=QuestionResponse, summary="Answer a question based on processed content")
 async def answer_question(question_request: QuestionRequest):
     """
-    Answer a question based on pre-processed content stored in a vector store.
+    Answer a question based on pre-processed content stored in one or more vector stores.
+
+    The question is embedded once, every store is searched concurrently and the
+    closest passages overall are sent to the model in a single call.
 
     Parameters:
     - question: The question to be answered
-    - vector_store_id: The identifier of the vector store to use for answering the question
+    - vector_store_id: The identifier of a vector store to use for answering the question
+    - vector_store_ids: Identifiers of several vector stores to search together
+    - collection: Name of a collection whose vector stores should all be searched
     - language: The language of the question and expected answer (default: Arabic)
+    - top_k: Number of passages given to the model as context (default: 3)
 
     Returns:
-    - A JSON object containing the answer to the provided question and a confidence score
+    - A JSON object containing the answer, a confidence score and the passages used
 
     Raises:
-    - HTTPException 404: If the specified vector store is not found
+    - HTTPException 400: If no vector store or collection is given
+    - HTTPException 404: If a specified vector store or collection is not found
     - HTTPException 500: If there's an error in answering the question
     """
-    vector_store = vector_stores.get(question_request.vector_store_id)
-    if not vector_store:
-        raise HTTPException(status_code=404, detail="Vector store not found")
-    
+    stores = resolve_vector_stores(
+        question_request.vector_store_id,
+        question_request.vector_store_ids,
+        question_request.collection
+    )
+
     try:
-        answer, confidence = await arabic_learning_utility.answer_question(
-            vector_store,
+        answer, confidence, hits = await arabic_learning_utility.answer_question(
+            stores,
             question_request.question,
-            language=question_request.language
+            language=question_request.language,
+            k=question_request.top_k
         )
-        return QuestionResponse(answer=answer, confidence=confidence)
+        return QuestionResponse(answer=answer, confidence=confidence, sources=to_passages(hits))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
 
+@router.post("/search", response_model=SearchResponse, summary="Search passages across vector stores")
+async def search(search_request: SearchRequest):
+    """
+    Find the passages closest to a query across one or more vector stores, without calling the model.
+
+    Parameters:
+    - query: The text to search for
+    - vector_store_id / vector_store_ids / collection: The stores to search
+    - top_k: Number of results to return (default: 4)
+
+    Returns:
+    - A JSON object containing the closest passages, closest first
+
+    Raises:
+    - HTTPException 400: If no vector store or collection is given
+    - HTTPException 404: If a specified vector store or collection is not found
+    - HTTPException 500: If there's an error during the search
+    """
+    stores = resolve_vector_stores(
+        search_request.vector_store_id,
+        search_request.vector_store_ids,
+        search_request.collection
+    )
+
+    try:
+        hits = await arabic_learning_utility.search(stores, search_request.query, search_request.top_k)
+        return SearchResponse(results=to_passages(hits))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching vector stores: {str(e)}")
+
 @router.get("/vector_store/{vector_store_id}/info", summary="Get information about a vector store")
 async def get_vector_store_info(vector_store_id: str):
     """
@@ -71,7 +164,7 @@ async def get_vector_store_info(vector_store_id: str):
     
     return {
         "id": vector_store_id,
-        "document_count": len(vector_store.get("documents", [])),
+        "document_count": vector_store["store"].index.ntotal,
         "language": vector_store.get("language", "Unknown")
     }
 
@@ -58,7 +58,7 @@ async def generate_quiz_endpoint(request: GenerateQuizRequest):
         Format the response as a JSON array of objects, each containing 'question', 'options', 'correct_answer', and 'explanation' fields.
         """
         
-        response = watson_wrapper.generate_text(prompt)
+        response = await watson_wrapper.generate_text(prompt)
         
         # Parse the response and convert it to QuizQuestion objects
         # Note: In a real-world scenario, you'd want to add more robust parsing and error handling here
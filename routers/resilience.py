@@ -0,0 +1,293 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+import aiohttp
+import asyncio
+import os
+import random
+import time
+from dotenv import load_dotenv
+from . import telemetry
+
+load_dotenv()
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class UpstreamError(Exception):
+    """
+    Failed call to an upstream service, carrying the HTTP status when there is one.
+    """
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in RETRYABLE_STATUS_CODES
+
+class CircuitOpenError(UpstreamError):
+    """
+    Raised without calling the upstream while its circuit breaker is open.
+    """
+
+class TokenExpiredError(UpstreamError):
+    """
+    The upstream rejected the access token (HTTP 401). Not retryable under the
+    policy: the caller refreshes the token outside it and then retries the call.
+    """
+    def __init__(self, message: str):
+        super().__init__(message, 401)
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by one slot per window of fast successes and is
+    cut multiplicatively when the upstream throttles (429) or slows down.
+    """
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float, decrease_factor: float = 0.7):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        async with self.condition:
+            while self.in_flight >= int(self.limit):
+                await self.condition.wait()
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float], throttled: bool):
+        async with self.condition:
+            self.in_flight -= 1
+            if throttled or (latency is not None and latency > self.latency_target):
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures, then lets a single probe through once the
+    reset timeout has elapsed.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+class UpstreamPolicy:
+    """
+    Client-side policy shared by every call to one upstream service.
+
+    Combines an adaptive concurrency limit, a per-attempt timeout, retries with
+    exponential backoff and full jitter (only for idempotent calls), a circuit
+    breaker and, optionally, a hedged second attempt once a call has been
+    running longer than the observed p95 latency.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_retries: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 5.0,
+        timeout: float = 60.0,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        latency_target: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+    ):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.limiter = AdaptiveLimiter(initial_concurrency, min_concurrency, max_concurrency, latency_target)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = deque(maxlen=200)
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "rejected": 0, "failures": 0}
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "UpstreamPolicy":
+        """
+        Build a policy whose settings can be overridden with `<NAME>_<SETTING>` variables,
+        e.g. WATSONX_MAX_RETRIES or TTS_HEDGE.
+        """
+        prefix = name.upper()
+        settings = dict(defaults)
+        for key, cast in (
+            ("max_retries", int), ("base_delay", float), ("max_delay", float), ("timeout", float),
+            ("initial_concurrency", int), ("min_concurrency", int), ("max_concurrency", int),
+            ("latency_target", float), ("failure_threshold", int), ("reset_timeout", float),
+        ):
+            value = os.getenv(f"{prefix}_{key.upper()}")
+            if value is not None:
+                settings[key] = cast(value)
+        hedge = os.getenv(f"{prefix}_HEDGE")
+        if hedge is not None:
+            settings["hedge"] = hedge.lower() == "true"
+        return cls(name, **settings)
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        The p95 latency of recent successful attempts, once enough have been observed.
+        """
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def _attempt(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        await self.limiter.acquire()
+        start_time = time.monotonic()
+        latency, throttled = None, False
+        try:
+            result = await asyncio.wait_for(fn(), timeout=self.timeout)
+            latency = time.monotonic() - start_time
+            self.latencies.append(latency)
+            return result
+        except asyncio.TimeoutError:
+            latency = time.monotonic() - start_time
+            raise UpstreamError(f"{self.name} timed out after {self.timeout}s")
+        except UpstreamError as e:
+            throttled = e.status == 429
+            raise
+        finally:
+            await self.limiter.release(latency, throttled)
+
+    async def _hedged_attempt(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._attempt(fn)
+
+        primary = asyncio.ensure_future(self._attempt(fn))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.stats["hedges"] += 1
+            telemetry.record_upstream(self.name, "hedged")
+            pending.add(asyncio.ensure_future(self._attempt(fn)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], idempotent: bool = True) -> Any:
+        """
+        Run `fn` under the policy. `fn` must raise UpstreamError for failed responses
+        so they can be classified as retryable or not.
+        """
+        self.stats["calls"] += 1
+        attempts = self.max_retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} circuit breaker is open")
+            try:
+                result = await (self._hedged_attempt(fn) if idempotent else self._attempt(fn))
+            except UpstreamError as e:
+                if e.retryable:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if not e.retryable or attempt == attempts - 1:
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if e.retry_after is not None:
+                    delay = max(delay, min(e.retry_after, self.max_delay))
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Not an upstream failure (e.g. cancellation): free a half-open probe slot
+                self.breaker.probing = False
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "hedge_delay": self.hedge_delay(),
+            **self.stats
+        }
+
+@contextmanager
+def upstream_errors(name: str):
+    """
+    Convert connection-level failures into retryable UpstreamErrors.
+    """
+    try:
+        yield
+    except aiohttp.ClientError as e:
+        raise UpstreamError(f"{name} request failed: {e}") from e
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+# Shared per upstream so every router and wrapper instance sees the same limits
+policies: Dict[str, UpstreamPolicy] = {
+    "iam": UpstreamPolicy.from_env("iam", timeout=15.0, initial_concurrency=4, latency_target=5.0),
+    "watsonx": UpstreamPolicy.from_env("watsonx", timeout=60.0, latency_target=20.0),
+    "tts": UpstreamPolicy.from_env("tts", timeout=30.0, latency_target=10.0),
+}
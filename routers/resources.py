@@ -0,0 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import functools
+import gc
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How heavy resources are loaded: "lazy" (on first use), "background" (in parallel
+# after startup, without delaying traffic), "eager" (in parallel before serving) or
+# "prefork" (fork-safe models loaded once in the parent and shared copy-on-write)
+MODEL_LOADING_MODE = os.getenv("MODEL_LOADING_MODE", "background").lower()
+
+# Backoff between background attempts to load a resource that failed
+RESOURCE_RETRY_BASE_SECONDS = float(os.getenv("RESOURCE_RETRY_BASE_SECONDS", 5))
+RESOURCE_RETRY_MAX_SECONDS = float(os.getenv("RESOURCE_RETRY_MAX_SECONDS", 300))
+
+class LazyResource:
+    """
+    Load an expensive object (model, remote client) once, on first use.
+
+    Loading is thread-safe, so the same resource can be requested from the event
+    loop and from executor threads. A failed load is recorded and retried on the
+    next request instead of taking the worker down.
+
+    Resources marked `fork_safe` hold no threads, sockets or CUDA state once
+    loaded, so they can be loaded in a pre-forking parent process. Only
+    `required` resources gate readiness; optional ones (remote clients) only
+    degrade the endpoints that use them.
+    """
+    def __init__(self, name: str, loader: Callable[[], Any], fork_safe: bool = False, required: bool = True):
+        self.name = name
+        self.loader = loader
+        self.fork_safe = fork_safe
+        self.required = required
+        self.value = None
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+        registry[name] = self
+
+    def get(self) -> Any:
+        if self.status == "ready":
+            return self.value
+        with self.lock:
+            if self.status == "ready":
+                return self.value
+            self.status = "loading"
+            start_time = time.time()
+            try:
+                self.value = self.loader()
+            except Exception as e:
+                self.status = "failed"
+                self.error = str(e)
+                raise
+            self.load_seconds = time.time() - start_time
+            self.status = "ready"
+            self.error = None
+            return self.value
+
+    async def aget(self) -> Any:
+        if self.status == "ready":
+            return self.value
+        return await asyncio.to_thread(self.get)
+
+    def info(self) -> Dict[str, Any]:
+        return {"status": self.status, "required": self.required, "error": self.error, "load_seconds": self.load_seconds}
+
+registry: Dict[str, LazyResource] = {}
+
+@functools.lru_cache(maxsize=None)
+def cuda_available() -> bool:
+    """
+    Whether a CUDA device is present, checked through NVML so that CUDA itself is
+    not initialised: a CUDA context in the parent process does not survive a fork.
+    """
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+def prefork_on_cpu() -> bool:
+    """
+    Whether GPU-capable models should be loaded in the pre-forking parent.
+
+    Only on hosts without CUDA: on GPU hosts each worker loads them onto the GPU
+    after forking instead of sharing a CPU copy.
+    """
+    return MODEL_LOADING_MODE == "prefork" and not cuda_available()
+
+async def load_all(retry: bool = True):
+    """
+    Load every registered resource in parallel, logging failures instead of raising.
+
+    With `retry`, failed loads are retried with exponential backoff until they
+    succeed, so a remote that is down at startup is picked up once it recovers.
+    """
+    async def load(resource: LazyResource):
+        attempt = 0
+        while resource.status != "ready":
+            try:
+                await resource.aget()
+                print(f"Loaded {resource.name} in {resource.load_seconds:.1f}s")
+            except Exception as e:
+                if not retry:
+                    print(f"Failed to load {resource.name}: {e}")
+                    return
+                delay = min(RESOURCE_RETRY_MAX_SECONDS, RESOURCE_RETRY_BASE_SECONDS * 2 ** attempt)
+                print(f"Failed to load {resource.name}: {e} (retrying in {delay:.0f}s)")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    await asyncio.gather(*(load(resource) for resource in registry.values()))
+
+def preload_for_fork():
+    """
+    Load fork-safe resources in the current (parent) process before workers fork.
+
+    Loaded objects are moved to the permanent GC generation so collections in the
+    workers do not touch their pages, keeping them shared copy-on-write.
+    """
+    if cuda_available():
+        print("CUDA is available: GPU-capable models are loaded by each worker after forking instead of being shared")
+    fork_safe = [resource for resource in registry.values() if resource.fork_safe]
+    with ThreadPoolExecutor(max_workers=max(len(fork_safe), 1)) as executor:
+        for resource, error in zip(fork_safe, executor.map(_try_load, fork_safe)):
+            if error is None:
+                print(f"Preloaded {resource.name} in {resource.load_seconds:.1f}s")
+            else:
+                print(f"Failed to preload {resource.name}: {error}")
+    gc.collect()
+    gc.freeze()
+
+def _try_load(resource: LazyResource) -> Optional[Exception]:
+    try:
+        resource.get()
+    except Exception as e:
+        return e
+    return None
+
+def is_ready() -> bool:
+    """
+    Whether every required resource has been loaded.
+
+    In lazy mode resources are only loaded on first use, so the worker is
+    considered ready as long as no required load has failed.
+    """
+    required = [resource for resource in registry.values() if resource.required]
+    if MODEL_LOADING_MODE == "lazy":
+        return all(resource.status != "failed" for resource in required)
+    return all(resource.status == "ready" for resource in required)
+
+def degraded() -> List[str]:
+    """
+    Names of optional resources that have failed to load.
+    """
+    return [name for name, resource in registry.items() if not resource.required and resource.status == "failed"]
+
+def readiness() -> Dict[str, Dict[str, Any]]:
+    """
+    Report the loading status of every registered resource.
+    """
+    return {name: resource.info() for name, resource in registry.items()}
@@ -0,0 +1,162 @@
+from contextlib import contextmanager
+from typing import Dict, Tuple
+import os
+import threading
+import time
+
+# Histogram buckets, in seconds for durations and bytes for payload sizes
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Set to an OTLP/HTTP collector (e.g. http://localhost:4318) to also export spans
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+class Histogram:
+    """
+    Cumulative histogram with Prometheus semantics, keyed by label values.
+    """
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        with _lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # bucket counts, then sum and count
+                series = self.series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self.series.items()):
+            labels = _format_labels(self.label_names, label_values)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {series[-1]}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-2]}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+class Counter:
+    """
+    Monotonic counter keyed by label values.
+    """
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with _lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_format_labels(self.label_names, label_values)}}} {value}")
+        return lines
+
+def _format_labels(names, values):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+_lock = threading.Lock()
+_tracer = None
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"), DURATION_BUCKETS
+)
+stage_duration = Histogram(
+    "stage_duration_seconds", "Duration of internal processing stages", ("stage", "outcome"), DURATION_BUCKETS
+)
+payload_size = Histogram(
+    "payload_size_bytes", "Size of payloads handled by each stage", ("stage", "direction"), SIZE_BUCKETS
+)
+upstream_responses = Counter(
+    "upstream_responses_total", "Responses received from upstream services by status code", ("upstream", "status")
+)
+
+METRICS = (http_request_duration, stage_duration, payload_size, upstream_responses)
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Time a processing stage and record it as a metric (and an OpenTelemetry span when enabled).
+
+    Usable from both coroutines and worker threads:
+
+        with telemetry.span("faiss_search", k=4):
+            ...
+    """
+    otel_span = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer is not None else None
+    if otel_span is not None:
+        otel_span.__enter__()
+    start_time = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - start_time, stage, "ok" if error is None else "error")
+        if otel_span is not None:
+            otel_span.__exit__(type(error) if error else None, error, error.__traceback__ if error else None)
+
+def record_payload(stage: str, size: int, direction: str = "in"):
+    """
+    Record the size in bytes of a payload entering or leaving a stage.
+    """
+    payload_size.observe(size, stage, direction)
+
+def record_upstream(upstream: str, status):
+    """
+    Count a response from an upstream service by its status code.
+    """
+    upstream_responses.inc(upstream, str(status))
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    http_request_duration.observe(duration, method, route, str(status))
+
+def render_metrics() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def configure_tracing(service_name: str = "arabic-learning-api") -> bool:
+    """
+    Export spans to an OTLP collector if OTEL_EXPORTER_OTLP_ENDPOINT is set.
+
+    OpenTelemetry is optional; tracing is skipped when its packages are missing.
+    """
+    global _tracer
+    if not OTEL_EXPORTER_OTLP_ENDPOINT:
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("OTEL_EXPORTER_OTLP_ENDPOINT is set but OpenTelemetry is not installed; tracing disabled")
+        return False
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{OTEL_EXPORTER_OTLP_ENDPOINT.rstrip('/')}/v1/traces")))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(__name__)
+    return True
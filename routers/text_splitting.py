@@ -0,0 +1,137 @@
+from langchain.text_splitter import TextSplitter
+from typing import Callable, List, Optional, Tuple
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Token budget per chunk (0 uses the embedding model's max sequence length)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 16))
+NORMALIZE_ARABIC = os.getenv("NORMALIZE_ARABIC", "true").lower() == "true"
+
+# Harakat, Quranic annotation marks and superscript alef
+ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06dc\u06df-\u06e8\u06ea-\u06ed]")
+TATWEEL = "\u0640"
+
+# Sentence ends (Latin and Arabic punctuation) and line breaks, which PyPDF often
+# emits instead of paragraph breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?؟؛…])\s+|\s*\n\s*")
+# Clause separators used to break up sentences that exceed the budget
+CLAUSE_BOUNDARY = re.compile(r"(?<=[،,:;])\s+")
+
+def normalize_arabic(text: str) -> str:
+    """
+    Strip diacritics and tatweel, and collapse runs of spaces.
+    """
+    text = ARABIC_DIACRITICS.sub("", text).replace(TATWEEL, "")
+    text = re.sub("[ \t\u00a0]+", " ", text)
+    return re.sub(r"\n\s*\n+", "\n", text).strip()
+
+class ArabicTokenTextSplitter(TextSplitter):
+    """
+    Split text into chunks measured in embedding-model tokens.
+
+    Text is cut at sentence punctuation (. ! ? ؟ ؛) and line breaks, then at
+    clause punctuation (، , : ;) and finally between words, so no chunk exceeds
+    the model's sequence length and gets silently truncated at embedding time.
+    Consecutive chunks share up to `chunk_overlap` tokens of whole sentences.
+    """
+    def __init__(
+        self,
+        tokenizer=None,
+        chunk_size: int = 126,
+        chunk_overlap: int = 16,
+        normalize: bool = True,
+        length_function: Optional[Callable[[str], int]] = None,
+        **kwargs
+    ):
+        self.tokenizer = tokenizer
+        self.normalize = normalize
+        self.fallback_length = length_function or (lambda text: max(1, len(text) // 3))
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=self.count_tokens, **kwargs)
+        self.max_tokens = chunk_size
+        self.overlap_tokens = chunk_overlap
+
+    def count_tokens(self, text: str) -> int:
+        return self._count_batch([text])[0]
+
+    def _count_batch(self, pieces: List[str]) -> List[int]:
+        if not pieces:
+            return []
+        if self.tokenizer is None:
+            return [self.fallback_length(piece) for piece in pieces]
+        return [len(ids) for ids in self.tokenizer(pieces, add_special_tokens=False)["input_ids"]]
+
+    def _units(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Break text into (piece, token count) units that each fit in the budget.
+        """
+        sentences = [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+        units = []
+        for sentence, count in zip(sentences, self._count_batch(sentences)):
+            if count <= self.max_tokens:
+                units.append((sentence, count))
+                continue
+            clauses = [clause for clause in CLAUSE_BOUNDARY.split(sentence) if clause.strip()]
+            for clause, clause_count in zip(clauses, self._count_batch(clauses)):
+                if clause_count <= self.max_tokens:
+                    units.append((clause, clause_count))
+                else:
+                    units.extend(self._split_words(clause))
+        return units
+
+    def _split_words(self, text: str) -> List[Tuple[str, int]]:
+        words = text.split()
+        pieces, current, current_tokens = [], [], 0
+        for word, count in zip(words, self._count_batch(words)):
+            if current and current_tokens + count > self.max_tokens:
+                pieces.append((" ".join(current), current_tokens))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += count
+        if current:
+            pieces.append((" ".join(current), current_tokens))
+        return pieces
+
+    def split_text(self, text: str) -> List[str]:
+        if self.normalize:
+            text = normalize_arabic(text)
+
+        chunks = []
+        current: List[Tuple[str, int]] = []
+        current_tokens = 0
+        for piece, count in self._units(text):
+            if current and current_tokens + count > self.max_tokens:
+                chunks.append(" ".join(unit for unit, _ in current))
+                # Carry trailing sentences into the next chunk as overlap
+                carry, carry_tokens = [], 0
+                for unit, unit_count in reversed(current):
+                    if carry_tokens + unit_count > self.overlap_tokens:
+                        break
+                    carry.insert(0, (unit, unit_count))
+                    carry_tokens += unit_count
+                if carry_tokens + count > self.max_tokens:
+                    carry, carry_tokens = [], 0
+                current, current_tokens = carry, carry_tokens
+            current.append((piece, count))
+            current_tokens += count
+        if current:
+            chunks.append(" ".join(unit for unit, _ in current))
+        return chunks
+
+def splitter_for(embedder) -> ArabicTokenTextSplitter:
+    """
+    Build a splitter sized for a LangChain HuggingFaceEmbeddings model.
+    """
+    model = getattr(embedder, "client", None)
+    tokenizer = getattr(model, "tokenizer", None)
+    # Leave room for the [CLS]/[SEP] tokens added at embedding time
+    max_tokens = CHUNK_MAX_TOKENS or (getattr(model, "max_seq_length", 128) - 2)
+    return ArabicTokenTextSplitter(
+        tokenizer=tokenizer,
+        chunk_size=max_tokens,
+        chunk_overlap=min(CHUNK_OVERLAP_TOKENS, max_tokens // 2),
+        normalize=NORMALIZE_ARABIC
+    )
@@ -38,6 +38,7 @@ async def text_to_speech(request: TextToSpeechRequest):
     - HTTPException 400: If there's an error in the input text
     - HTTPException 500: If there's an error in the text-to-speech conversion
     """
+    global total_requests, total_characters_processed, sum_duration, average_request_time
     total_requests = total_requests + 1
     
     total_characters_processed= total_characters_processed + len(request.text)
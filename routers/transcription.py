@@ -1,24 +1,34 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
-import torch
 import numpy as np
 import io
 import soundfile as sf
-import librosa
 from pydantic import BaseModel
 import os
 import base64
+import asyncio
+from . import resources
+from .resources import LazyResource
+from . import telemetry
 
 router = APIRouter()
 
 # Whisper model setup
-device = "cuda" if torch.cuda.is_available() else "cpu"
 model_id = os.getenv("WHISPER_MODEL_ID", "openai/whisper-large-v3-turbo")
 
-print(f"Loading Whisper model on {device}...")
-model = AutoModelForSpeechSeq2Seq.from_pretrained(model_id).to(device)
-processor = AutoProcessor.from_pretrained(model_id)
+def _load_whisper():
+    import torch
+    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+
+    # Whisper is only pre-forked on hosts without CUDA (see resources.prefork_on_cpu),
+    # so on GPU hosts each worker loads it onto the GPU after forking
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Loading Whisper model on {device}...")
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(model_id).to(device)
+    processor = AutoProcessor.from_pretrained(model_id)
+    return model, processor, device
+
+whisper = LazyResource("whisper", _load_whisper, fork_safe=resources.prefork_on_cpu())
 
 class TranscriptionRequest(BaseModel):
     audio: str
@@ -26,6 +36,37 @@ class TranscriptionRequest(BaseModel):
 class TranscriptionResponse(BaseModel):
     transcription: str
 
+def _transcribe(audio_data: bytes) -> str:
+    import torch
+
+    model, processor, device = whisper.get()
+
+    # Read the audio data and convert it to the correct format
+    with telemetry.span("audio_decode"):
+        audio, sample_rate = sf.read(io.BytesIO(audio_data))
+
+    # Ensure audio is mono
+    if len(audio.shape) > 1:
+        audio = audio.mean(axis=1)
+
+    # Resample to 16kHz if necessary
+    if sample_rate != 16000:
+        import librosa
+        print(f"Resampling from {sample_rate}Hz to 16000Hz")
+        with telemetry.span("audio_resample"):
+            audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=16000)
+
+    # Preprocess audio to match Whisper's requirements
+    input_features = processor.feature_extractor(audio, sampling_rate=16000, return_tensors="pt").input_features.to(device)
+
+    # Perform inference
+    with telemetry.span("whisper_generate", device=device), torch.no_grad():
+        generated_ids = model.generate(input_features=input_features)
+
+    # Decode and return the transcription
+    transcription = processor.batch_decode(generated_ids, skip_special_tokens=True)
+    return transcription[0]
+
 @router.post("/transcribe/", 
              response_model=TranscriptionResponse,
              summary="Transcribe an audio file",
@@ -34,6 +75,9 @@ async def transcribe_audio(request: TranscriptionRequest):
     """
     Transcribe a base64-encoded audio using the Whisper-large-v3-turbo model.
 
+    The model is loaded on first use (or in the background at startup) and
+    inference runs in a worker thread so the event loop stays responsive.
+
     Parameters:
     - request: A JSON object containing the base64-encoded audio data.
 
@@ -46,30 +90,11 @@ async def transcribe_audio(request: TranscriptionRequest):
     """
     try:
         # Decode the base64 audio data
-        audio_data = base64.b64decode(request.audio)
-        
-        # Read the audio data and convert it to the correct format
-        audio, sample_rate = sf.read(io.BytesIO(audio_data))
-        
-        # Ensure audio is mono
-        if len(audio.shape) > 1:
-            audio = audio.mean(axis=1)
-        
-        # Resample to 16kHz if necessary
-        if sample_rate != 16000:
-            print(f"Resampling from {sample_rate}Hz to 16000Hz")
-            audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=16000)
-        
-        # Preprocess audio to match Whisper's requirements
-        input_features = processor.feature_extractor(audio, sampling_rate=16000, return_tensors="pt").input_features.to(device)
-        
-        # Perform inference
-        with torch.no_grad():
-            generated_ids = model.generate(input_features=input_features)
-        
-        # Decode and return the transcription
-        transcription = processor.batch_decode(generated_ids, skip_special_tokens=True)
-        return TranscriptionResponse(transcription=transcription[0])
+        telemetry.record_payload("base64_decode", len(request.audio))
+        with telemetry.span("base64_decode"):
+            audio_data = base64.b64decode(request.audio)
+        transcription = await asyncio.to_thread(_transcribe, audio_data)
+        return TranscriptionResponse(transcription=transcription)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during transcription: {str(e)}")
@@ -80,6 +105,7 @@ async def get_model_info():
     Retrieve information about the currently loaded Whisper model.
 
     Returns:
-    - A JSON object containing the model ID and the device it's running on.
+    - A JSON object containing the model ID, the device it's running on (once loaded) and its loading status.
     """
-    return {"model_id": model_id, "device": device}
\ No newline at end of file
+    device = whisper.value[2] if whisper.status == "ready" else None
+    return {"model_id": model_id, "device": device, "status": whisper.status}
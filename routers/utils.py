@@ -5,16 +5,56 @@ from dotenv import load_dotenv
 from langchain import PromptTemplate
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import FAISS
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
 from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import CharacterTextSplitter
 import tempfile
-from ibm_watson import TextToSpeechV1
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 import aiohttp
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import heapq
+import time
+import itertools
+import uuid
+from . import resources
+from .resources import LazyResource
+from . import telemetry
+from .text_splitting import NORMALIZE_ARABIC, normalize_arabic, splitter_for
+from .vector_index import build_index, choose_index_type
+from .resilience import TokenExpiredError, UpstreamError, parse_retry_after, policies, upstream_errors
 
 load_dotenv()
 
+IBM_IAM_URL = os.getenv("IBM_IAM_URL", "https://iam.cloud.ibm.com")
+# IAM tokens are refreshed this many seconds before they expire
+IAM_TOKEN_REFRESH_MARGIN = float(os.getenv("IAM_TOKEN_REFRESH_MARGIN_SECONDS", 300))
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+
+def _load_embeddings():
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+def _init_text_to_speech():
+    from ibm_watson import TextToSpeechV1
+    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+
+    tts_api_key = os.getenv("IBM_WATSON_TTS_API_KEY")
+    tts_url = os.getenv("IBM_WATSON_TTS_URL")
+    authenticator = IAMAuthenticator(tts_api_key, url=IBM_IAM_URL)
+    tts = TextToSpeechV1(authenticator=authenticator)
+    tts.set_service_url(tts_url)
+    return tts
+
+# Dedicated, bounded pool for the blocking Watson TTS SDK: calls abandoned by a
+# timeout or a hedge keep running here instead of filling the default executor
+# used by PDF loading, FAISS and Whisper
+TTS_MAX_THREADS = int(os.getenv("TTS_MAX_THREADS", 8))
+tts_executor = ThreadPoolExecutor(max_workers=TTS_MAX_THREADS, thread_name_prefix="tts")
+
+# Shared across every router so each model/client is loaded once per worker
+embeddings = LazyResource("embeddings", _load_embeddings, fork_safe=resources.prefork_on_cpu())
+text_to_speech_client = LazyResource("text_to_speech", _init_text_to_speech, required=False)
+
 class IBMWatsonXAIWrapper:
     def __init__(self, api_key, project_id, url, model_id="sdaia/allam-1-13b-instruct", max_new_tokens=400, decoding_method="greedy", temperature=0.7, top_p=1, repetition_penalty=1.0):
         self.api_key = api_key
@@ -29,46 +69,131 @@ class IBMWatsonXAIWrapper:
             "repetition_penalty": repetition_penalty
         }
         self.access_token = None
+        self.token_expires_at = None
+        # Bumped on every refresh, so a request can tell whether the token it used was already replaced
+        self.token_version = 0
         self.headers = None
+        self._token_lock = None
+
+    @property
+    def token_lock(self):
+        # Created on first use so it binds to the running event loop
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        return self._token_lock
 
     async def get_access_token(self):
-        token_url = "https://iam.cloud.ibm.com/identity/token"
+        """
+        Request a new IAM token.
+
+        Returns:
+        - The access token and its lifetime in seconds (None if IAM does not say)
+        """
+        token_url = f"{IBM_IAM_URL}/identity/token"
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         data = {
             "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
             "apikey": self.api_key
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(token_url, headers=headers, data=data) as response:
-                response_json = await response.json()
-                return response_json["access_token"]
 
-    async def generate_text(self, prompt):
-        if not self.access_token:
-            self.access_token = await self.get_access_token()
-            self.headers = {
-                "Accept": "application/json",
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.access_token}"
-            }
+        async def request_token():
+            with telemetry.span("iam_token"), upstream_errors("iam"):
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(token_url, headers=headers, data=data) as response:
+                        telemetry.record_upstream("iam", response.status)
+                        if response.status != 200:
+                            raise UpstreamError(
+                                f"IAM token request failed: {await response.text()}",
+                                response.status,
+                                parse_retry_after(response.headers.get("Retry-After"))
+                            )
+                        response_json = await response.json()
+                        return response_json["access_token"], response_json.get("expires_in")
 
+        return await policies["iam"].call(request_token)
+
+    async def _authenticate(self):
+        access_token, expires_in = await self.get_access_token()
+        self.access_token = access_token
+        self.token_version += 1
+        self.token_expires_at = time.monotonic() + float(expires_in) if expires_in else None
+        self.headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.access_token}"
+        }
+
+    def _token_usable(self, rejected_version=None):
+        if not self.access_token or self.token_version == rejected_version:
+            return False
+        return self.token_expires_at is None or time.monotonic() < self.token_expires_at - IAM_TOKEN_REFRESH_MARGIN
+
+    async def _ensure_token(self, rejected_version=None):
+        """
+        Make sure a usable token is set, refreshing it ahead of expiry or after a 401.
+
+        Runs outside the watsonx policy and under a lock, so concurrent requests
+        share one IAM call, and a token already replaced by another request is
+        not refreshed again.
+        """
+        if self._token_usable(rejected_version):
+            return
+        async with self.token_lock:
+            if not self._token_usable(rejected_version):
+                await self._authenticate()
+
+    async def _request_generation(self, body, headers):
+        with telemetry.span("watson_generate", model_id=self.model_id), upstream_errors("watsonx"):
+            async with aiohttp.ClientSession() as session:
+                async with session.post(self.url, headers=headers, json=body) as response:
+                    telemetry.record_upstream("watsonx", response.status)
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status == 401:
+                        raise TokenExpiredError(f"Access token rejected: {await response.text()}")
+                    raise UpstreamError(
+                        f"Non-200 response: {await response.text()}",
+                        response.status,
+                        parse_retry_after(response.headers.get("Retry-After"))
+                    )
+
+    async def generate_text(self, prompt):
         body = {
             "input": f"<s> [INST] {prompt} [/INST]",
             "parameters": self.parameters,
             "model_id": self.model_id,
             "project_id": self.project_id
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.url, headers=self.headers, json=body) as response:
-                if response.status != 200:
-                    raise Exception(f"Non-200 response: {await response.text()}")
-                data = await response.json()
-                return data.get('results', [{}])[0].get('generated_text', "No text generated")
+        telemetry.record_payload("watson_generate", len(body["input"].encode("utf-8")), "out")
+        # Tokens are fetched under the IAM policy only, so an IAM outage does not
+        # multiply through watsonx retries or count against the watsonx breaker and limit
+        rejected_version = None
+        for attempt in range(2):
+            await self._ensure_token(rejected_version)
+            token_version, headers = self.token_version, self.headers
+            try:
+                # Generation is treated as idempotent: a retried or hedged prompt only costs tokens
+                data = await policies["watsonx"].call(lambda: self._request_generation(body, headers))
+                break
+            except TokenExpiredError:
+                # The token was revoked or expired early: refresh once and retry
+                if attempt == 1:
+                    raise
+                rejected_version = token_version
+        generated_text = data.get('results', [{}])[0].get('generated_text', "No text generated")
+        telemetry.record_payload("watson_generate", len(generated_text.encode("utf-8")), "in")
+        return generated_text
+
+    def get_status(self):
+        return {
+            "model_id": self.model_id,
+            "authenticated": self.access_token is not None,
+            "policy": policies["watsonx"].get_status()
+        }
 
 class ArabicLearningUtility:
     def __init__(self):
         self.watson_wrapper = self._init_watson_wrapper()
-        self.tts = self._init_text_to_speech()
         self.templates = self._init_templates()
 
     def _init_watson_wrapper(self):
@@ -77,13 +202,9 @@ class ArabicLearningUtility:
         url = os.getenv("IBM_WATSONX_URL", "https://eu-de.ml.cloud.ibm.com")
         return IBMWatsonXAIWrapper(api_key=api_key, project_id=project_id, url=url)
 
-    def _init_text_to_speech(self):
-        tts_api_key = os.getenv("IBM_WATSON_TTS_API_KEY")
-        tts_url = os.getenv("IBM_WATSON_TTS_URL")
-        authenticator = IAMAuthenticator(tts_api_key)
-        tts = TextToSpeechV1(authenticator=authenticator)
-        tts.set_service_url(tts_url)
-        return tts
+    @property
+    def tts(self):
+        return text_to_speech_client.get()
 
     def _init_templates(self):
         return {
@@ -114,21 +235,50 @@ class ArabicLearningUtility:
         }
 
     async def process_pdf(self, file_content):
+        telemetry.record_payload("pdf_load", len(file_content))
         with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
             tmp_file.write(file_content)
             tmp_file_path = tmp_file.name
 
-        loader = PyPDFLoader(tmp_file_path)
-        documents = await asyncio.to_thread(loader.load)
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-        texts = await asyncio.to_thread(text_splitter.split_documents, documents)
-        
-        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-        vector_store = await asyncio.to_thread(FAISS.from_documents, texts, embeddings)
+        try:
+            loader = PyPDFLoader(tmp_file_path)
+            with telemetry.span("pdf_load"):
+                documents = await asyncio.to_thread(loader.load)
+        finally:
+            os.unlink(tmp_file_path)
+
+        # Chunks are budgeted in embedding-model tokens so none is truncated at embedding time
+        embedder = await embeddings.aget()
+        text_splitter = splitter_for(embedder)
+        with telemetry.span("text_split"):
+            texts = await asyncio.to_thread(text_splitter.split_documents, documents)
+        contents = [text.page_content for text in texts]
+        telemetry.record_payload("embed_documents", sum(len(content.encode("utf-8")) for content in contents))
 
-        os.unlink(tmp_file_path)
+        with telemetry.span("embed_documents", chunks=len(contents)):
+            vectors = await asyncio.to_thread(embedder.embed_documents, contents)
+        index_type = choose_index_type(len(vectors))
+        with telemetry.span("faiss_build", vectors=len(vectors), index_type=index_type):
+            vector_store = await asyncio.to_thread(
+                self._build_vector_store, contents, vectors, [text.metadata for text in texts], embedder
+            )
         return vector_store
 
+    @staticmethod
+    def _build_vector_store(contents, vectors, metadatas, embedder):
+        """
+        Build the FAISS index chosen for the store size directly, without an
+        intermediate flat index, and wrap it in a LangChain FAISS store.
+        """
+        index, _ = build_index(vectors)
+        document_ids = [str(uuid.uuid4()) for _ in contents]
+        docstore = InMemoryDocstore({
+            document_id: Document(page_content=content, metadata=metadata)
+            for document_id, content, metadata in zip(document_ids, contents, metadatas)
+        })
+        # FAISS ids follow insertion order, so position i maps to document i
+        return FAISS(embedder, index, docstore, dict(enumerate(document_ids)))
+
     async def generate_text(self, template_name, **kwargs):
         template = self.templates.get(template_name)
         if not template:
@@ -138,20 +288,73 @@ class ArabicLearningUtility:
 
     async def text_to_speech(self, text):
         try:
-            audio_file = await asyncio.to_thread(
-                self.tts.synthesize,
-                text,
-                accept='audio/mp3',
-                voice='ar-MS_OmarVoice'
-            )
+            tts = await text_to_speech_client.aget()
+            telemetry.record_payload("tts_synthesize", len(text.encode("utf-8")), "out")
+
+            async def synthesize():
+                with telemetry.span("tts_synthesize"):
+                    try:
+                        response = await asyncio.get_running_loop().run_in_executor(
+                            tts_executor,
+                            functools.partial(tts.synthesize, text, accept='audio/mp3', voice='ar-MS_OmarVoice')
+                        )
+                    except Exception as e:
+                        # ibm_watson raises ApiException, carrying the HTTP status in `code`
+                        status = getattr(e, "code", None)
+                        telemetry.record_upstream("tts", status or "error")
+                        http_response = getattr(e, "http_response", None)
+                        retry_after = http_response.headers.get("Retry-After") if http_response is not None else None
+                        raise UpstreamError(str(e), status, parse_retry_after(retry_after)) from e
+                telemetry.record_upstream("tts", response.get_status_code())
+                return response
+
+            audio_file = await policies["tts"].call(synthesize)
             audio_file = audio_file.get_result().content
+            telemetry.record_payload("tts_synthesize", len(audio_file), "in")
             audio_base64 = base64.b64encode(audio_file).decode('utf-8')
             return audio_base64
         except Exception as e:
             raise Exception(f"Error in text-to-speech conversion: {str(e)}")
 
-    async def answer_question(self, vector_store, question):
-        docs = await asyncio.to_thread(vector_store.similarity_search, question)
-        context = docs[0].page_content if docs else "لم يتم العثور على معلومات ذات صلة."
+    async def search(self, vector_stores, question, k=4):
+        """
+        Embed the question once, search every store concurrently and merge the
+        hits into a global top-k by L2 distance (smaller is closer).
+
+        Returns a list of (vector_store_id, document, distance) tuples.
+        """
+        embedder = await embeddings.aget()
+        # Stored chunks have diacritics and tatweel stripped, so the query must too
+        query = normalize_arabic(question) if NORMALIZE_ARABIC else question
+        with telemetry.span("embed_query"):
+            query_vector = await asyncio.to_thread(embedder.embed_query, query)
+
+        async def search_store(vector_store_id, vector_store):
+            with telemetry.span("faiss_search"):
+                docs_and_scores = await asyncio.to_thread(vector_store.similarity_search_with_score_by_vector, query_vector, k)
+            return [(vector_store_id, doc, float(distance)) for doc, distance in docs_and_scores]
+
+        results = await asyncio.gather(*(search_store(store_id, store) for store_id, store in vector_stores.items()))
+        return heapq.nsmallest(k, itertools.chain.from_iterable(results), key=lambda result: result[2])
+
+    async def answer_question(self, vector_stores, question, language="ar", k=3):
+        hits = await self.search(vector_stores, question, k)
+        if hits:
+            context = "\n\n".join(doc.page_content for _, doc, _ in hits)
+            confidence = 1 / (1 + hits[0][2])
+        else:
+            context = "لم يتم العثور على معلومات ذات صلة."
+            confidence = 0.0
         prompt = f"بناءً على المعلومات التالية: '{context}'، أجب عن هذا السؤال: {question}"
-        return await self.watson_wrapper.generate_text(prompt)
\ No newline at end of file
+        if language == "en":
+            prompt += " Answer in English."
+        answer = await self.watson_wrapper.generate_text(prompt)
+        return answer, confidence, hits
+
+    def get_status(self):
+        return {
+            "watson": self.watson_wrapper.get_status(),
+            "embeddings": embeddings.status,
+            "text_to_speech": text_to_speech_client.status,
+            "text_to_speech_policy": policies["tts"].get_status()
+        }
@@ -0,0 +1,107 @@
+import faiss
+import numpy as np
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Stores with fewer vectors than this keep an exact flat index
+FAISS_FLAT_MAX_VECTORS = int(os.getenv("FAISS_FLAT_MAX_VECTORS", 10000))
+
+# Approximate index used above the threshold: "hnsw" or "ivf"
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "hnsw").lower()
+
+# Vector compression for approximate indexes: "none", "fp16" or "pq"
+FAISS_COMPRESSION = os.getenv("FAISS_COMPRESSION", "none").lower()
+
+# IVF settings (nlist defaults to 4 * sqrt(n), capped by the available training points)
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", 0))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", 16))
+
+# HNSW settings
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", 32))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", 80))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", 64))
+
+# Number of PQ sub-quantizers (must divide the embedding dimension)
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", 48))
+
+# Training uses at most this many vectors per IVF list
+TRAINING_SAMPLES_PER_LIST = 256
+
+# 8-bit PQ trains 256 centroids per sub-quantizer, so it needs at least that many vectors
+PQ_NBITS = 8
+PQ_MIN_TRAINING_VECTORS = 2 ** PQ_NBITS
+
+def choose_index_type(num_vectors: int, index_type: str = None, compression: str = None, min_vectors: int = None) -> str:
+    """
+    Pick the index description for a store of the given size, e.g. "flat", "hnsw" or "ivf+pq".
+
+    Stores below `min_vectors` (default FAISS_FLAT_MAX_VECTORS) keep an exact flat
+    index; pass 0 to always build the approximate one. PQ compression falls back
+    to fp16 when there are too few vectors to train its codebooks.
+    """
+    flat_max_vectors = FAISS_FLAT_MAX_VECTORS if min_vectors is None else min_vectors
+    if num_vectors < flat_max_vectors:
+        return "flat"
+    index_type = (index_type or FAISS_INDEX_TYPE).lower()
+    compression = (compression or FAISS_COMPRESSION).lower()
+    if index_type not in ("hnsw", "ivf"):
+        raise ValueError(f"Unsupported FAISS index type: {index_type}")
+    if compression not in ("none", "fp16", "pq"):
+        raise ValueError(f"Unsupported FAISS compression: {compression}")
+    if compression == "pq" and num_vectors < PQ_MIN_TRAINING_VECTORS:
+        compression = "fp16"
+    return index_type if compression == "none" else f"{index_type}+{compression}"
+
+def _pq_m(dimension: int) -> int:
+    m = min(FAISS_PQ_M, dimension)
+    while dimension % m:
+        m -= 1
+    return m
+
+def _new_index(description: str, dimension: int, num_vectors: int) -> faiss.Index:
+    index_type, _, compression = description.partition("+")
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+
+    if index_type == "hnsw":
+        if compression == "fp16":
+            index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, FAISS_HNSW_M)
+        elif compression == "pq":
+            index = faiss.IndexHNSWPQ(dimension, _pq_m(dimension), FAISS_HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, FAISS_HNSW_M)
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+        return index
+
+    # k-means wants ~39 training points per list, so small stores get fewer lists
+    nlist = FAISS_IVF_NLIST or int(4 * np.sqrt(num_vectors))
+    nlist = max(1, min(nlist, num_vectors // 39))
+    storage = {"": "Flat", "fp16": "SQfp16", "pq": f"PQ{_pq_m(dimension)}"}[compression]
+    index = faiss.index_factory(dimension, f"IVF{nlist},{storage}")
+    index.nprobe = min(FAISS_IVF_NPROBE, nlist)
+    return index
+
+def build_index(vectors, index_type: str = None, compression: str = None, min_vectors: int = None):
+    """
+    Build and train a FAISS index for the given embeddings.
+
+    Returns the index and its description. Vectors keep their insertion order as
+    ids, so the index can replace the flat one of a LangChain FAISS store.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    num_vectors, dimension = vectors.shape
+    description = choose_index_type(num_vectors, index_type, compression, min_vectors)
+    index = _new_index(description, dimension, num_vectors)
+    if not index.is_trained:
+        nlist = getattr(index, "nlist", 1)
+        max_samples = max(nlist * TRAINING_SAMPLES_PER_LIST, 10000)
+        if num_vectors > max_samples:
+            sample = vectors[np.random.default_rng(0).choice(num_vectors, max_samples, replace=False)]
+        else:
+            sample = vectors
+        index.train(sample)
+    index.add(vectors)
+    return index, description